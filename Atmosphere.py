@@ -0,0 +1,84 @@
+# ATMOSPHERE SUMMARY:
+# U.S. Standard Atmosphere 1976 tabulated on a uniform altitude grid for the batched trajectory in 'Trajectory.py'.
+# Up to 86 km the table is computed from the seven US-76 layers of constant lapse rate (geopotential altitude); above it the
+# density and temperature are interpolated from the published US-76 values (log-linear in density) up to 1000 km, with the
+# pressure and speed of sound of sea-level air composition. The tables are built once per resolution and cached, and
+# interpolate() looks up every lane with one index computation and a linear blend, without any transcendental function.
+
+from functools import lru_cache
+import numpy as np
+
+# CONSTANTS OF US-76
+g0 = 9.80665  # gravity at sea level (m/s^2)
+r0 = 6356766  # radius of earth for geopotential altitude (m)
+M0 = 0.0289644  # molar mass of air at sea level (kg/mol)
+R_star = 8.31432  # universal gas constant (J/mol/K)
+R_air = R_star / M0  # gas constant of air (J/kg/K)
+gamma_air = 1.4  # ratio of specific heats of air
+T_sea, P_sea = 288.15, 101325  # sea-level temperature (K) and pressure (Pa)
+layer_H = [0, 11000, 20000, 32000, 47000, 51000, 71000, 84852]  # geopotential altitude of the layer bases (m)
+layer_L = [-0.0065, 0, 0.001, 0.0028, 0, -0.0028, -0.002]  # temperature lapse rate of the layers (K/m)
+# Published US-76 density (kg/m^3) and temperature (K) from 86 km to 1000 km (km)
+upper_h = [86, 90, 100, 110, 120, 130, 140, 150, 160, 180, 200, 250, 300, 350, 400, 450, 500, 600, 700, 800, 900, 1000]
+upper_rho = [6.958e-6, 3.416e-6, 5.604e-7, 9.708e-8, 2.222e-8, 8.152e-9, 3.831e-9, 2.076e-9, 1.233e-9, 5.194e-10, 2.541e-10,
+             6.073e-11, 1.916e-11, 7.014e-12, 2.803e-12, 1.184e-12, 5.215e-13, 1.137e-13, 3.070e-14, 1.136e-14, 5.759e-15, 3.561e-15]
+upper_T = [186.87, 186.87, 195.08, 240.00, 360.00, 469.27, 559.63, 634.39, 696.29, 790.07, 854.56, 941.33, 976.01, 990.06,
+           995.83, 998.22, 999.24, 999.85, 999.97, 999.99, 1000.0, 1000.0]
+
+names = ['rho', 'P', 'T', 'a']  # columns of a table: density (kg/m^3), pressure (Pa), temperature (K), speed of sound (m/s)
+
+def us76(h):
+    # Returns the density, pressure, temperature and speed of sound of US-76 at the geometric altitudes h (m), 0 to 1000 km
+    h = np.asarray(h, dtype=float)
+    H = r0 * h / (r0 + h)  # geopotential altitude (m)
+    T_base, P_base = [T_sea], [float(P_sea)]  # temperature and pressure at the layer bases
+    for i, L in enumerate(layer_L):
+        dH = layer_H[i + 1] - layer_H[i]
+        T_base.append(T_base[i] + L * dH)
+        P_base.append(P_base[i] * (np.exp(-g0 * dH / (R_air * T_base[i])) if L == 0 else (T_base[i] / T_base[i + 1])**(g0 / (R_air * L))))
+    k = np.clip(np.searchsorted(layer_H, H, side='right') - 1, 0, len(layer_L) - 1)
+    L, dH = np.array(layer_L)[k], H - np.array(layer_H)[k]
+    T_k, P_k = np.array(T_base)[k], np.array(P_base)[k]
+    T = T_k + L * dH
+    with np.errstate(divide='ignore', invalid='ignore'):
+        P = np.where(L == 0, P_k * np.exp(-g0 * dH / (R_air * T_k)), P_k * (T_k / T)**(g0 / (R_air * np.where(L == 0, 1, L))))
+    rho = P / (R_air * T)
+    upper = h > upper_h[0] * 1000
+    rho = np.where(upper, np.exp(np.interp(h / 1000, upper_h, np.log(upper_rho))), rho)
+    T = np.where(upper, np.interp(h / 1000, upper_h, upper_T), T)
+    P = np.where(upper, rho * R_air * T, P)
+    return rho, P, T, np.sqrt(gamma_air * R_air * T)
+
+@lru_cache(maxsize=None)
+def atmosphereTable(dh=100, top=1000000, dtype='float64'):
+    # US-76 table every dh (m) from 0 to top (m): a dict of the columns of names and their slope per step, and 'dlnrho_dh', the
+    # relative density gradient (1/m). The table is computed in float64 and stored as dtype ('float32' for the reduced precision
+    # sweeps of Trajectory.setPrecision). Cached per resolution and type, the arrays must not be modified
+    h = np.arange(0, top + dh, dh, dtype=float)
+    table = {'dh': dh, 'h': h}
+    for name, value in zip(names, us76(h)):
+        table[name] = value
+    table['dlnrho_dh'] = np.gradient(np.log(table['rho']), h)
+    table = addSlopes(table)
+    return {name: value.astype(dtype) if isinstance(value, np.ndarray) else value for name, value in table.items()}
+
+def addSlopes(table):
+    # Adds the slope per table step of every column, used by interpolate()
+    for name in [name for name in table if name not in ('dh', 'h') and not name.endswith('_slope')]:
+        table[name + '_slope'] = np.append(np.diff(table[name]), 0)
+    return table
+
+def interpolate(table, h, columns=('rho',)):
+    # Linear interpolation of the columns of a table at the altitudes h (any array shape); altitudes outside the table take
+    # the values of its ends. The values keep the float type of the table and of h
+    x = np.multiply(h, 1 / table['dh'], dtype=np.result_type(h, table['h']))
+    np.clip(x, 0.0, table['h'].size - 1.0, out=x)
+    i = x.astype(np.intp)
+    f = np.subtract(x, i, out=x)
+    values = []
+    for name in columns:
+        value = table[name + '_slope'][i]
+        value *= f
+        value += table[name][i]
+        values.append(value)
+    return values
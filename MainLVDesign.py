@@ -5,7 +5,7 @@
 # After the propellant mass budgets are calculated, the "LaunchVehicle" objects are initialized, which are the parents of the "Step" objects.
 # The "Step" objects initialize parameters such as propellant choice, gas used to pressurize tanks, materials, dome shape, and number of engines. The geometry of the step's body and tank components are then sized to accomodate the required volume of propellant.
 # After each "Step" is sized, the interstages of the "LaunchVehicle" are sized and the moments of inertia of each launch vehicle component are tabulated into a table.
-# A MATLAB script is called in "runTrajectory()" to run trajectory simulations of the "LaunchVehicle" objects using a gravity-turn and the optimal trajectory is selected based on quickest time to orbit and largest amount of propellant left for reserves.
+# "runTrajectory()" runs batched trajectory simulations (Trajectory.py) of the "LaunchVehicle" objects using a gravity-turn and the optimal trajectory is the feasible one with the least delta-v to circularize at the end of the gravity turn.
 # The conditions at the point of maximum dynamic pressure (Max-Q) for the optimal trajectory is tabulated, such as: angle of attack, vehicle velocity, wind speed, left-over propellant mass.
 # SCRIPT DOES NOT YET AUTOMATE:::
 # Using the Max-Q data, Axial Load, Shear Load, and Bending Moment diagrams are made for the "LaunchVehicle" at the Max-Q condition, and Ground Wind Load Condition in Excel.
@@ -18,6 +18,8 @@ from math import sqrt, pow, pi, cos, sin, acos, asin, atan, radians, degrees
 from Mission import Mission
 from LaunchVehicle import LaunchVehicle
 from Step import Step
+from Trajectory import initTrajectory
+from TrajectoryPlots import plotHistories
 from pptx import Presentation
 import matlab.engine
 import pandas as pd
@@ -43,12 +45,29 @@ def generateLVMassEstimates(missions):
     eng.Mass_Estimates_Zephyr_PythonLinked(nargout=0)
     print("Mass estimates generated.")
 
-def runTrajectory():
-    print("Running MATLAB Trajectory...")
-    eng = matlab.engine.start_matlab()
-    #eng.Trajectory_Run_TL_0324(nargout=0) # For Latona and Minerva
-    eng.Trajectory_Run_TL_0407(nargout=0) # For Zephyr
-    print("MATLAB Trajectory Complete.")
+def runTrajectory(LaunchVehicles):
+    # Sweeps the gravity-turn trajectory grid of each LaunchVehicle from its TrajReqs csv (replaces the MATLAB
+    # scripts Trajectory_Run_TL_0324.m and Trajectory_Run_TL_0407.m), writes the Max-Q conditions and the decimated history of
+    # the optimal trajectory and plots the histories of all vehicles (replaces plotTraj.m). A vehicle without a feasible
+    # trajectory is reported and skipped; returns the vehicles with one
+    print("Running Python Trajectory...")
+    histories = []
+    flown = []
+    for LV in LaunchVehicles:
+        traj = initTrajectory(LV)
+        traj.sweep(cache=True)  # reuses the results of an earlier run if the TrajReqs and settings are unchanged
+        if len(traj.results) == 0:
+            print('No feasible trajectory was found for ' + traj.name + ', it is skipped (no Max-Q conditions are written)')
+            continue
+        traj.print()
+        traj.writeMaxQConditions()
+        history = traj.history(tolerance=0.002)  # within 0.2% of the range of every variable
+        traj.writeHistory(history)
+        histories.append((traj.name, traj.mission, history))
+        flown.append(LV)
+    plotHistories(histories, processes=1)  # this script has no main guard and starts MATLAB at import, so spawned worker processes would run it again
+    print("Python Trajectory Complete.")
+    return flown
 
 material = ('Aluminum 6061-T6', 'Rubber', 'Aluminum 2024-T6', 'Aluminum 2014-T6', 'Aluminum 7075-T6', 'Aluminum 2219-T87', 'Aluminum 2219-T852') # materials
 grav_est = ('80% gravity loss', 0.5, 1, 1.5, 2) # gravity estimates (km/s)
@@ -143,8 +162,8 @@ for i in range(len(LaunchVehicles)):
     LV.massMoments(loads_conditions[0])
     LV.addSlide()
     LV.generateTrajReqs()
-runTrajectory() # function runs trajectory for launch vehicles specified inside function
-for i in range(len(LaunchVehicles)):
-    LV = LaunchVehicles[i]
+FlownVehicles = runTrajectory(LaunchVehicles) # runs the trajectory sweep of every launch vehicle, returns those with a feasible trajectory
+for i in range(len(FlownVehicles)):
+    LV = FlownVehicles[i]
     LV.massMoments(loads_conditions[1]) # wind loads
 print('The program is finished!')
\ No newline at end of file
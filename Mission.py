@@ -2,6 +2,39 @@ import math
 import numpy as np
 from math import sqrt, pow, pi, cos, sin, tan, acos, asin, atan, radians, degrees, exp, log
 
+def dVBudget(lat, inc, h_a, h_p, delta_plane=0, losses_gravity='80% gravity loss', drag_loss=0.2, recovery=False):
+    # Delta-v requirements of Mission.set_dV_reqs() for arrays of launch latitudes and inclinations (rad), e.g. every launch
+    # site and inclination of Trajectory.siteTrade() at once. h_a, h_p are the apoapsis and periapsis altitudes (km) and
+    # delta_plane the plane change at apoapsis (rad). Returns an array of the dV_reqs_names rows (km/s) by the broadcast shape
+    # of lat and inc; the inclinations a site cannot launch into directly (|cos(inc)| > cos(lat)) are NaN
+    lat, inc = np.broadcast_arrays(np.asarray(lat, dtype=float), np.asarray(inc, dtype=float))
+    r_p = Mission.r_E + h_p # periapsis radius (km)
+    r_a = Mission.r_E + h_a # apoapsis radius (km)
+    a = (r_p + r_a)/2 # semi-major axis (km)
+    v_p = sqrt(2*Mission.mu_E*(1/r_p - 1/(2*a))) # periapsis velocity (km/s)
+    v_a = sqrt(2*Mission.mu_E*(1/r_a - 1/(2*a))) # apoapsis velocity (km/s)
+    v_c = sqrt(Mission.mu_E/r_a) # circular velocity at h_a (km/s)
+    v_LS = Mission.v_equator * np.cos(lat) # launch site velocity (km/s)
+    retrograde = inc > pi/2
+    aux = np.where(retrograde, pi - inc, inc) # launch window auxiliary angle (rad)
+    with np.errstate(invalid='ignore'):
+        flt_path = np.arcsin(np.cos(aux)/np.cos(lat)) # flight path angle (rad), NaN if the site is above the inclination
+    azimuth = np.where(retrograde, pi + flt_path, flt_path) # azimuth angle (rad)
+    v_BO_S = -v_p*np.cos(flt_path)*np.cos(azimuth) # South burnout velocity (km/s)
+    v_BO_E = np.where(retrograde, -1, 1)*v_p*np.cos(flt_path)*np.sin(azimuth) # East burnout velocity (km/s)
+    v_BO_Z = v_p*np.sin(flt_path) # Zenith burnout velocity (km/s)
+    dv_N = np.sqrt(v_BO_S**2 + (v_BO_E - v_LS)**2 + v_BO_Z**2) # total delta-v needed (km/s)
+    grav_loss = 0
+    if (type(losses_gravity) == str) & (losses_gravity == '80% gravity loss'):
+        grav_loss = 0.8*sqrt(2*Mission.mu_E*h_p/((h_p+Mission.r_E)*Mission.r_E)) # 80# gravity loss eqn (km/s)
+    elif (type(losses_gravity) == int) | (type(losses_gravity) == float):
+        grav_loss = losses_gravity
+    apo_kick = v_c - v_a # apoapsis kick burn (km/s)
+    dv_maneuvers = 0.343 if recovery else 0 # landing dv burn (km/s)
+    dv_plane = 2*v_a*sin(delta_plane/2) # delta-v needed for plane-change (km/s)
+    dv_design = dv_N + grav_loss + drag_loss + apo_kick + dv_maneuvers + dv_plane # delta-v design is the total delta v required (km/s)
+    return np.stack(np.broadcast_arrays(dv_N, dv_design, dv_plane, grav_loss, drag_loss, apo_kick, dv_maneuvers))
+
 class Mission:
     """Declares the Mission parameters inside a Mission object. Uses function getTrajReqs to find the delta-v trajectory requirements needed to size the LV"""
     
@@ -10,6 +43,7 @@ class Mission:
     mu_E = 398600  # gravitational parameter of earth (km^3/s)
     r_E = 6378  # radius of earth (km)
     v_equator = 0.4651 # equatorial velocity in (km/s)
+    launch_sites = {'Kodiak': 57.8324683, 'KSC': 28.5226326595524, 'Vandenberg': 34.7331518097343} # latitude of the launch sites (deg)
     dV_reqs_names = ['dv needed', 'dv design', 'dv plane change', 'dv gravity loss', 'dv drag loss', 'dv apo kick', 'dv maneuvers']
     # Delta-V Trajectory Requirements Variable
     dV_reqs = '\'dv_reqs\' is not yet initialized, call the set method \'set_dV_reqs\''
@@ -25,112 +59,34 @@ class Mission:
         #print(self.input)
         if self.input[0] == 'One':
             self.payload = 30
-            delta_plane = 0
-            inc = radians(60)
-            h_a = 500 # apoapsis altitude (km)
-            h_p = 200 # periapsis altitude (km)
+            self.delta_plane = 0
+            self.inc = radians(60)
+            self.h_a = 500 # apoapsis altitude (km)
+            self.h_p = 200 # periapsis altitude (km)
         elif self.input[0] =='Two':
             self.payload = 95
-            delta_plane = radians(10) # plane change of 10 degrees (rad)
-            inc = radians(98) # inclination (radians)
-            h_a = 550 # apoapsis altitude (km)
-            h_p = 200 # periapsis altitude (km)
+            self.delta_plane = radians(10) # plane change of 10 degrees (rad)
+            self.inc = radians(98) # inclination (radians)
+            self.h_a = 550 # apoapsis altitude (km)
+            self.h_p = 200 # periapsis altitude (km)
         elif self.input[0] =='Three':
             self.payload = 95
-            delta_plane = radians(10) # plane change of 10 degrees (rad)
-            inc = radians(98) # inclination (radians)
-            h_a = 550 # apoapsis altitude (km)
-            h_p = 200 # periapsis altitude (km)
+            self.delta_plane = radians(10) # plane change of 10 degrees (rad)
+            self.inc = radians(98) # inclination (radians)
+            self.h_a = 550 # apoapsis altitude (km)
+            self.h_p = 200 # periapsis altitude (km)
         elif self.input[0] == 'LEAP':
             self.payload = 1
-            delta_plane = 0
-            inc = radians(0)
-            h_a = 15.24
-            h_p = 15.24 # periapsis altitude (km)
-
-        # h_p = 200 # periapsis altitude (km)
-        if self.input[4] == 'Kodiak':
-            self.lat = radians(57.8324683) # latitude (radians)
-
-        elif self.input[4] == 'Vandenberg':
-            self.lat = radians(34.7331518097343)
-   
-        elif self.input[4] == 'KSC':
-            self.lat = radians(28.5226326595524)
-        
-   
-        ### Orbital Calculations
-        #  Orbital velocities
-        r_p = self.r_E + h_p # periapsis radius (km)
-        r_a = self.r_E + h_a # apoapsis radius (km)
-        a = (r_p + r_a)/2 # semi-major axis (km)
-        #print(r_p, r_a, a)
-
-        v_p = sqrt(2*self.mu_E*(1/r_p - 1/(2*a))) # periapsis velocity (km/s)
-        #print(v_p)
-        v_a = sqrt(2*self.mu_E*(1/r_a - 1/(2*a))) # apoapsis velocity (km/s)
-        #print(v_a)
-        v_c = sqrt(self.mu_E/r_a) # circular velocity at h_a (km/s)
-        #print(v_c)
-        v_LS = self.v_equator * cos(self.lat) # launch site velocity (km/s)
-        #print(v_p, v_a, v_c, v_LS)
-
-    
+            self.delta_plane = 0
+            self.inc = radians(0)
+            self.h_a = 15.24
+            self.h_p = 15.24 # periapsis altitude (km)
 
-        # Angles
-        if inc > pi/2:
-            aux = pi - inc # launch window auxiliary angle (rad)
-        elif inc < pi/2:
-            aux = inc # launch window auxiliary angle (rad)
-        flt_path = asin(cos(aux)/cos(self.lat)) # flight path angle (rad)
-        #print(aux, flt_path)
-
-        # Azimuth Angle and Burnout Velocities
-        if inc > pi/2:
-            azimuth = pi + flt_path # azimuth angle (rad)
-            v_BO_S = -v_p*cos(flt_path)*cos(azimuth) # South burnout velocity (km/s)
-            v_BO_E = -v_p*cos(flt_path)*sin(azimuth) # East burnout velocity (km/s)
-            v_BO_Z = v_p*sin(flt_path) # Zenith burnouth velocity (km/s)
-
-        elif inc < pi/2:
-            azimuth = flt_path
-            v_BO_S = -v_p*cos(flt_path)*cos(azimuth) # South burnout velocity (km/s)
-            v_BO_E = v_p*cos(flt_path)*sin(azimuth) # East burnout velocity (km/s)
-            v_BO_Z = v_p*sin(flt_path) # Zenith burnouth velocity (km/s)
-
-        #print(v_BO_S, v_BO_E, v_BO_Z)
-        v_N_S = v_BO_S # South needed delta-v (km/s)
-        v_N_E = v_BO_E - v_LS # East needed delta-v (km/s)
-        v_N_Z = v_BO_Z # Zenith needed delta-v (km/2)
-        #print(v_N_S, v_N_E, v_N_Z)
-
-        dv_maneuvers = 0
-        if self.input[1]:
-            dv_maneuvers += 0.343 # landing dv burn (km/s)
-        else: dv_maneuvers +=0
-
-        dv_N = sqrt(pow(v_N_S,2) + pow(v_N_E,2) + pow(v_N_Z,2)) # total delta-v needed (km/s)
-        grav_loss = 0
-        if (type(self.input[2]) == str) & (self.input[2] == '80% gravity loss'):
-            grav_loss = 0.8*sqrt(2*self.mu_E*h_p/((h_p+self.r_E)*self.r_E)) # 80# gravity loss eqn (km/s)
-        elif (type(self.input[2]) == int) | (type(self.input[2]) == float):
-            grav_loss = self.input[1]
-        apo_kick = v_c - v_a # apoapsis kick burn (km/s)
+        self.lat = radians(self.launch_sites[self.input[4]]) # latitude (radians)
 
-        if self.input[0] == 'One':
-            dv_design = dv_N + grav_loss + self.input[3] + apo_kick + dv_maneuvers # delta-v design is the total delta v required (km/s)
-            #print(dv_N, grav_loss, drag_loss, apo_kick, dv_maneuvers, dv_design)
-            self.dV_reqs = [dv_N, dv_design, 0, grav_loss, self.input[3], apo_kick, dv_maneuvers]
-        elif self.input[0] =='Two':
-            dv_plane = 2*v_a*sin(delta_plane/2) # delta-v needed for plane-change (km/s)
-            dv_design = dv_N + grav_loss + self.input[3] + apo_kick + dv_maneuvers + dv_plane # delta-v design is the total delta v required (km/s)
-            #print(dv_N, grav_loss, drag_loss, apo_kick, dv_maneuvers, dv_plane, dv_design)
-            self.dV_reqs = [dv_N, dv_design, dv_plane, grav_loss, self.input[3], apo_kick, dv_maneuvers]
-        elif self.input[0] =='Three':
-            dv_plane = 2*v_a*sin(delta_plane/2) # delta-v needed for plane-change (km/s)
-            dv_design = dv_N + grav_loss + self.input[3] + apo_kick + dv_maneuvers + dv_plane # delta-v design is the total delta v required (km/s)
-            #print(dv_N, grav_loss, drag_loss, apo_kick, dv_maneuvers, dv_plane, dv_design)
-            self.dV_reqs = [dv_N, dv_design, dv_plane, grav_loss, self.input[3], apo_kick, dv_maneuvers]
+        # dv needed, design, plane change, gravity loss, drag loss, apo kick and maneuvers (km/s), see dVBudget
+        dV_reqs = dVBudget(self.lat, self.inc, self.h_a, self.h_p, self.delta_plane, self.input[2], self.input[3], self.input[1])
+        self.dV_reqs = [float(dv) for dv in dV_reqs]
     
     def print(self):
         print('Here are the mission requirements for Mission ' + self.input[0] + ', where the recovery is ' + str(self.input[1]) + ' and the launch site is ' + str(self.input[4]))
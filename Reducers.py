@@ -0,0 +1,210 @@
+# REDUCERS SUMMARY:
+# Streaming reducers of the batched trajectory sweep in 'Trajectory.py'. Instead of per-step histories of every candidate
+# (t, gamma, x, h, rho, drag, g, v, q, a, m... in 'Trajectory_TL_0407.m'), a reducer keeps a fixed number of arrays per lane
+# in the state dict of the integrator, so memory per candidate does not grow with the number of steps and the arrays follow
+# the lanes through compaction. The integrator calls the hooks of every reducer in Trajectory.reducers:
+#   init     - when the state of a batch is created, to add the arrays of the reducer
+#   step     - every step of the active lanes, with the dynamic pressure, air density and thrust of the step
+#   staging  - at burnout of a stage (burnout) and separation (separate)
+#   finished - for the lanes whose trajectory ended this step, with their final results
+#   collect  - at the end of a batch, with the candidate number of every lane
+# MaxQ is always the first reducer, the others can use its arrays (e.g. max_q_descending). A reducer with keep_dominated needs
+# the feasible candidates that cannot be optimal too, so a sweep running it does not prune as 'dominated'.
+# result() returns the reduction of every batch since start().
+
+import numpy as np
+import pandas as pd
+
+class Reducer:
+    """Base class of the streaming reducers of a trajectory sweep, every hook does nothing"""
+
+    keep_dominated = False
+
+    def __init__(self):
+        self.start(None)
+
+    def start(self, trajectory):
+        self.tables = []
+
+    def init(self, trajectory, lanes, state):
+        pass
+
+    def step(self, trajectory, lanes, state, active, q, rho, thrust):
+        pass
+
+    def staging(self, trajectory, lanes, state, burnout, separate):
+        pass
+
+    def finished(self, trajectory, final):
+        pass
+
+    def collect(self, trajectory, lanes, state, candidates):
+        table = self.table(trajectory, lanes, state)
+        if table is not None:
+            table.index = candidates
+            self.tables.append(table)
+
+    def table(self, trajectory, lanes, state):
+        # Reduction of the lanes of a batch, one row per lane
+        return None
+
+    def result(self):
+        return pd.concat(self.tables) if self.tables else None
+
+class MaxQ(Reducer):
+    """Running maximum of the dynamic pressure of every lane during the ascent and the state at it, the Max-Q conditions of
+    'plotTrajZ.m', with the angle of attack and wind speed of the lanes flying through a wind. The ascent ends the first time
+    gamma drops below 0, so a lane that falls back does not count its descent"""
+
+    names = ['q', 't', 'thrust', 'v', 'm', 'h', 'gamma', 'rho', 'alpha', 'wind']
+
+    def init(self, trajectory, lanes, state):
+        for name in self.names:
+            state['max_q_' + name] = np.zeros(lanes['pitch_kick'].size)
+        state['max_q_descending'] = np.zeros(lanes['pitch_kick'].size, dtype=bool)
+
+    def step(self, trajectory, lanes, state, active, q, rho, thrust):
+        state['max_q_descending'] = state['max_q_descending'] | (active & (state['gamma'] < 0))
+        new_max = active & (q > state['max_q_q']) & ~state['max_q_descending']
+        if new_max.any():
+            wind, crosswind = trajectory.wind(lanes, state)
+            if wind is None:
+                alpha, wind = 0, 0
+            else:
+                alpha, wind = trajectory.angleOfAttack(lanes, state), np.hypot(wind, crosswind)
+            for name, value in [('q', q), ('t', state['t']), ('thrust', thrust), ('v', state['v']), ('m', state['m']),
+                                ('h', state['h']), ('gamma', state['gamma']), ('rho', rho), ('alpha', alpha), ('wind', wind)]:
+                state['max_q_' + name] = np.where(new_max, value, state['max_q_' + name])
+
+    def table(self, trajectory, lanes, state):
+        return trajectory.maxQTable(lanes, state)
+
+class FinalState(Reducer):
+    """State of every lane at the end of its trajectory"""
+
+    def __init__(self, names=('t', 'v', 'gamma', 'h', 'x', 'm', 'stage')):
+        self.names = list(names)
+        Reducer.__init__(self)
+
+    def table(self, trajectory, lanes, state):
+        return pd.DataFrame({name: state[name] for name in self.names})
+
+class BurnoutTimes(Reducer):
+    """Time of burnout of every stage of every lane (NaN if the stage did not burn out)"""
+
+    def init(self, trajectory, lanes, state):
+        for i in range(3):
+            state['burnout_t_' + str(i + 1)] = np.full(lanes['pitch_kick'].size, np.nan)
+
+    def staging(self, trajectory, lanes, state, burnout, separate):
+        # separation has already moved the stage of the lanes that separated to the next one
+        stage = state['stage'] - separate
+        for i in range(3):
+            name = 'burnout_t_' + str(i + 1)
+            state[name] = np.where(burnout & (stage == i), state['t'], state[name])
+
+    def table(self, trajectory, lanes, state):
+        return pd.DataFrame({'Stage ' + str(i + 1) + ' Burnout (s)': state['burnout_t_' + str(i + 1)] for i in range(3)})
+
+class TopK(Reducer):
+    """The k feasible candidates with the least objective (a results column, by default Trajectory.objective), kept as the
+    lanes finish so the ranking never needs the results of the whole sweep"""
+
+    def __init__(self, k=10, objective=None):
+        self.k = k
+        self.objective = objective
+        self.keep_dominated = k > 1 or objective is not None  # the dominated pruning keeps only the least delta-v to circularize
+        Reducer.__init__(self)
+
+    def start(self, trajectory):
+        self.best = pd.DataFrame()
+
+    def finished(self, trajectory, final):
+        objective = self.objective if self.objective is not None else trajectory.objective
+        feasible = pd.DataFrame(final)[final['check']]
+        if len(feasible) > 0:
+            best = pd.concat([self.best, feasible.set_index('candidate')]) if len(self.best) > 0 else feasible.set_index('candidate')
+            self.best = best.sort_values(objective).iloc[:self.k]
+
+    def result(self):
+        return self.best.drop(columns='check', errors='ignore')
+
+class LoadsEnvelope(Reducer):
+    """Largest dynamic pressure and q-alpha of every lane during the ascent with the state at each, kept for the feasible
+    candidates, and their envelope: the worst feasible flight for the wind-loads sizing of LaunchVehicle.massMoments()"""
+
+    names = ['t', 'q', 'alpha', 'q_alpha', 'v', 'h', 'm']
+    keep_dominated = True  # the envelope covers every feasible flight, not only those that can be optimal
+    columns = ['Time (s)', 'Dynamic Pressure (Pa)', 'Angle of Attack (rad)', 'q-alpha (Pa rad)', 'Velocity (m/s)', 'Height (m)', 'Mass Burned (kg)']
+
+    def __init__(self, crosswind=0):
+        self.crosswind = crosswind  # design wind normal to the trajectory plane for the angle of attack (m/s)
+        Reducer.__init__(self)
+
+    def init(self, trajectory, lanes, state):
+        for prefix in ['loads_q_', 'loads_qa_']:
+            for name in self.names:
+                state[prefix + name] = np.zeros(lanes['pitch_kick'].size)
+
+    def step(self, trajectory, lanes, state, active, q, rho, thrust):
+        alpha = trajectory.angleOfAttack(lanes, state, self.crosswind)
+        values = {'t': state['t'], 'q': q, 'alpha': alpha, 'q_alpha': q * alpha, 'v': state['v'], 'h': state['h'], 'm': state['m']}
+        ascent = active & ~state['max_q_descending']
+        for prefix, name in [('loads_q_', 'q'), ('loads_qa_', 'q_alpha')]:
+            new_max = ascent & (values[name] > state[prefix + name])
+            if new_max.any():
+                for value_name, value in values.items():
+                    state[prefix + value_name] = np.where(new_max, value, state[prefix + value_name])
+
+    def table(self, trajectory, lanes, state):
+        # Both snapshots of every lane, the Max-Q columns first
+        table = {}
+        for prefix, label in [('loads_q_', 'Max-q '), ('loads_qa_', 'Max q-alpha ')]:
+            for name, column in zip(self.names, self.columns):
+                value = lanes['mi'][0] - state[prefix + name] if name == 'm' else state[prefix + name]
+                table[label + column] = value
+        return pd.DataFrame(table)
+
+    def collect(self, trajectory, lanes, state, candidates):
+        # Keeps the feasible lanes only
+        check = trajectory.finalChecks(lanes, state)[2]
+        table = self.table(trajectory, lanes, state)[check]
+        table.index = np.asarray(candidates)[check]
+        self.tables.append(table)
+
+    def result(self):
+        # Envelope of the feasible candidates: the Max-Q row of the candidate with the largest dynamic pressure and the
+        # q-alpha row of the candidate with the largest q-alpha
+        feasible = Reducer.result(self)
+        if feasible is None or len(feasible) == 0:
+            return pd.DataFrame(columns=['Candidate'] + self.columns)
+        rows = []
+        for label, column in [('Max-q ', 'Dynamic Pressure (Pa)'), ('Max q-alpha ', 'q-alpha (Pa rad)')]:
+            worst = feasible[label + column].idxmax()
+            row = {'Candidate': worst}
+            row.update({name: feasible.loc[worst, label + name] for name in self.columns})
+            rows.append(row)
+        return pd.DataFrame(rows, index=['Max-q', 'Max q-alpha'])
+
+class History(Reducer):
+    """State of every lane at every step, for the history export of a few lanes (Trajectory.history). Unlike the other reducers
+    its memory grows with the number of steps, and the lanes must not be compacted while it records"""
+
+    names = ['t', 'h', 'x', 'v', 'gamma', 'q', 'm']
+
+    def init(self, trajectory, lanes, state):
+        self.values = []  # per step: array of names x lanes
+        self.active = []  # per step: lanes that took the step
+
+    def step(self, trajectory, lanes, state, active, q, rho, thrust):
+        values = dict(state, q=q)
+        self.values.append(np.stack([values[name] for name in self.names]))
+        self.active.append(active.copy())
+
+    def table(self, trajectory, lanes, state):
+        return None
+
+    def lane(self, i):
+        # History of lane i as a DataFrame, one row per step it took
+        values = np.stack(self.values)[:, :, i]
+        return pd.DataFrame(values[np.array(self.active)[:, i]], columns=self.names)
@@ -0,0 +1,144 @@
+# RESULT STORE SUMMARY:
+# Memory-mapped columnar store of the results of a trajectory sweep, replacing the 'Results' matrix of the MATLAB run scripts
+# that only survives in a saved workspace (e.g. 'Trajectory_TL_0407_Workspace.mat'). A store is a directory holding one .npy
+# file per column, opened with numpy memory maps, and 'store.json' with the number of rows, the column types, the categories of
+# the text columns and the parameter axes of the sweep grid. Rows are appended by Trajectory.sweep(store=...) after every batch,
+# and queries read the columns they test block by block, so stores larger than memory can be explored.
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+class ResultStore:
+    """Appendable memory-mapped columnar table of sweep results, see queries in select()"""
+
+    block_size = 1000000  # rows read at once by select()
+    initial_capacity = 100000  # rows allocated when a store is created, doubled when full
+
+    def __init__(self, path, mode='r'):
+        # Opens the store at path; mode is 'r' (read only) or 'r+' (appendable)
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, 'store.json')) as file:
+            self.meta = json.load(file)
+        self.columns = {}
+        for name in self.meta['columns']:
+            self.openColumn(name)
+
+    @classmethod
+    def create(cls, path, axes=None):
+        # Creates an empty store at path; axes are the parameter axes of the sweep grid (dict of name: values)
+        os.makedirs(path, exist_ok=True)
+        meta = {'length': 0, 'capacity': 0, 'columns': {}, 'categories': {},
+                'axes': {name: np.asarray(values, dtype=float).tolist() for name, values in (axes or {}).items()}}
+        with open(os.path.join(path, 'store.json'), 'w') as file:
+            json.dump(meta, file)
+        return cls(path, 'r+')
+
+    def __len__(self):
+        return self.meta['length']
+
+    def columnFile(self, name):
+        return os.path.join(self.path, str(list(self.meta['columns']).index(name)) + '.npy')
+
+    def openColumn(self, name):
+        self.columns[name] = np.load(self.columnFile(name), mmap_mode=self.mode)
+
+    def writeMeta(self):
+        with open(os.path.join(self.path, 'store.json'), 'w') as file:
+            json.dump(self.meta, file)
+
+    def encode(self, name, values):
+        # Text columns (e.g. the prune reason) are stored as integer codes of their categories
+        values = np.asarray(values)
+        if values.dtype.kind not in 'OUS':
+            return values
+        categories = self.meta['categories'].setdefault(name, [])
+        for value in pd.unique(values):
+            if str(value) not in categories:
+                categories.append(str(value))
+        return pd.Categorical(values.astype(str), categories=categories).codes.astype(np.int16)
+
+    def grow(self, capacity):
+        # Reallocates every column file with room for capacity rows
+        length = self.meta['length']
+        for name, dtype in self.meta['columns'].items():
+            old = self.columns.pop(name, None)
+            data = np.array(old[:length]) if old is not None else None
+            del old
+            column = np.lib.format.open_memmap(self.columnFile(name), mode='w+', dtype=dtype, shape=(capacity,))
+            if data is not None:
+                column[:length] = data
+            column.flush()
+            del column
+            self.openColumn(name)
+        self.meta['capacity'] = capacity
+
+    def append(self, table):
+        # Appends the rows of a DataFrame; its index is stored as the 'candidate' column
+        if self.mode == 'r':
+            raise ValueError('The result store ' + self.path + ' is read only')
+        table = table.reset_index(names='candidate')
+        values = {name: self.encode(name, table[name].to_numpy()) for name in table.columns}
+        new = [name for name in values if name not in self.meta['columns']]
+        if new and self.meta['length'] > 0:
+            raise ValueError('Columns ' + str(new) + ' are not in the result store ' + self.path)
+        for name in new:
+            self.meta['columns'][name] = values[name].dtype.str
+        length, n = self.meta['length'], len(table)
+        if new or length + n > self.meta['capacity']:
+            capacity = max(self.meta['capacity'], self.initial_capacity)
+            while capacity < length + n:
+                capacity *= 2
+            self.grow(capacity)
+        for name, column in self.columns.items():
+            column[length:length + n] = values[name]
+            column.flush()
+        self.meta['length'] = length + n
+        self.writeMeta()
+
+    def column(self, name):
+        # Memory map of the stored rows of a column (codes for text columns)
+        return self.columns[name][:self.meta['length']]
+
+    def decode(self, name, values):
+        if name in self.meta['categories']:
+            return np.array(self.meta['categories'][name], dtype=object)[values]
+        return np.asarray(values)
+
+    def select(self, columns=None, **ranges):
+        # Returns the rows whose columns lie in the given (low, high) ranges (None for an open end) or equal a given value, e.g.
+        # select(pitch_kick=(radians(0.3), radians(0.5)), mleft_3=(0.2, None), check=True). Only the tested columns are read,
+        # block_size rows at a time, and only the matching rows of the returned columns (default all) are loaded
+        length = self.meta['length']
+        index = []
+        for start in range(0, length, self.block_size):
+            stop = min(start + self.block_size, length)
+            match = np.ones(stop - start, dtype=bool)
+            for name, condition in ranges.items():
+                values = self.decode(name, self.columns[name][start:stop])
+                if isinstance(condition, tuple):
+                    low, high = condition
+                    if low is not None:
+                        match &= values >= low
+                    if high is not None:
+                        match &= values <= high
+                else:
+                    match &= values == condition
+            index.append(start + np.flatnonzero(match))
+        index = np.concatenate(index) if index else np.zeros(0, dtype=int)
+        columns = [name for name in self.meta['columns'] if name != 'candidate'] if columns is None else columns
+        table = pd.DataFrame({name: self.decode(name, self.columns[name][index]) for name in columns})
+        table.index = self.columns['candidate'][index] if 'candidate' in self.columns else index
+        return table
+
+    def axes(self):
+        # Parameter axes of the sweep grid
+        return {name: np.array(values) for name, values in self.meta['axes'].items()}
+
+    def axisIndex(self, table):
+        # Position on every parameter axis of the rows of a selected table, from their candidate number (the grid position)
+        axes = self.axes()
+        positions = np.unravel_index(np.asarray(table.index), [len(values) for values in axes.values()])
+        return pd.DataFrame(dict(zip(axes, positions)), index=table.index)
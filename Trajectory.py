@@ -0,0 +1,1836 @@
+# TRAJECTORY SUMMARY:
+# Python replacement of the MATLAB gravity-turn scripts 'Trajectory_TL_0407.m' and 'Trajectory_Run_TL_0407.m'.
+# The step vectors are the same as the MATLAB function inputs: [Cd, Radius, mass initial, mass final, Thrust, Isp] of each step (in kg, m, s),
+# loaded from the 'LVTrajectory/<name>TrajReqs.csv' files written by LaunchVehicle.generateTrajReqs().
+# Instead of seven nested for-loops running one scalar Euler gravity-turn per combination, every candidate of the
+# (stage thrust scale factors x pitch kick x mleft) grid is a lane of NumPy arrays and all lanes are advanced at once.
+# The optimal trajectory is selected the same way as the MATLAB run script (minimum delta-v to circularize of the feasible candidates)
+# and its Max-Q conditions are written to 'LVMasses/Max Q Conditions_<name>.csv' for the wind-loads mass moments.
+
+import copy
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from math import pi, sqrt, sin, cos, exp, inf, radians, degrees
+from Atmosphere import atmosphereTable, interpolate, addSlopes
+from Mission import Mission, dVBudget
+from Reducers import MaxQ, History
+from ResultStore import ResultStore
+
+def loadTrajReqs(name, PL, TW=(1.4, 1.05, 0.9), Cd=0.2):
+    # Returns the step1, step2 and step3 vectors [Cd, Radius, mi, mf, Thrust, Isp] from 'LVTrajectory/<name>TrajReqs.csv'.
+    # The payload PL (kg) rides on the last step. The thrust of each step is the T/W in TW times the weight of the step and every
+    # step above it, as in the MATLAB run scripts, except the steps of shared_thrust that reuse the thrust of another vehicle's step;
+    # pass TW=None to use the 'Thrust' column of the csv instead.
+    # Two-step vehicles get a step3 of zeros like the MATLAB function inputs. Every vehicle is flown as serial stages, including
+    # Latona-2: 'Trajectory_TL_0320.m' flies the Latona mission 2 stage 1 as four boosters and the core burning in parallel (with
+    # the drag area of all five, and the core propellant burned in stage 1 taken from stage 2), which is not modelled here.
+    df = pd.read_csv('LVTrajectory/' + name + 'TrajReqs.csv')
+    num_steps = len(df)
+    steps = []
+    for i in range(3):
+        if i < num_steps:
+            mi = float(df['Initial Stage Mass'][i]) # step mass initial (kg)
+            mf = float(df['Empty Stage Mass'][i]) # step mass final (kg)
+            if i == num_steps - 1:
+                mi += PL
+                mf += PL
+            steps.append([Cd, float(df['Radius'][i]), mi, mf, float(df['Thrust'][i]), float(df['Isp'][i])])
+        else:
+            steps.append([0, 0, 0, 0, 0, 0])
+    if TW is not None:
+        for i in range(num_steps):
+            m_stack = sum(steps[j][2] for j in range(i, num_steps)) # mass of this step and every step above it (kg)
+            steps[i][4] = TW[i] * m_stack * Trajectory.g0
+        for i, (other, j) in Trajectory.shared_thrust.get(name, {}).items():
+            other_PL = loadMission(int(other.split('-')[1])).payload
+            steps[i][4] = loadTrajReqs(other, other_PL, TW, Cd)[j][4] # thrust of the step of the other vehicle flying its own mission (N)
+    return steps[0], steps[1], steps[2]
+
+def loadMission(mission):
+    # Mission of a mission number (1 or 2) from its launch site in 'MainLVDesign.py', with set_dV_reqs() called for its payload and latitude
+    mission_type = {number: name for name, number in Trajectory.mission_numbers.items()}[mission]
+    requirements = Mission(mission_type, False, '80% gravity loss', 0.2, Trajectory.mission_sites[mission_type])
+    requirements.set_dV_reqs()
+    return requirements
+
+def loadCdTables(name):
+    # Returns the Cd(Mach) table of each step from 'LVTrajectory/<name>CdMach.csv' (columns 'Mach', 'Cd 1', 'Cd 2', 'Cd 3'), for
+    # Trajectory.setCdTables(), or None if the vehicle has no such file. Missing step columns are None
+    try:
+        df = pd.read_csv('LVTrajectory/' + name + 'CdMach.csv')
+    except FileNotFoundError:
+        return None
+    mach = df['Mach'].to_numpy(dtype=float)
+    return [(mach, df['Cd ' + str(i + 1)].to_numpy(dtype=float)) if 'Cd ' + str(i + 1) in df else None for i in range(3)]
+
+def compactLanes(arrays, keep):
+    # Returns the lanes selected by keep (boolean mask or lane numbers) of a dict of lane arrays; stage arrays are indexed on their last axis
+    return {name: value[..., keep] for name, value in arrays.items()}
+
+def decimateHistory(history, every=None, tolerance=None, keep=()):
+    # Returns the rows of a trajectory history (DataFrame with a 't' column) kept for export and plotting: every every-th row,
+    # and with tolerance the fewest rows found by Douglas-Peucker simplification such that linear interpolation in time
+    # between kept rows is within tolerance of every column, as a fraction of the range of the column. The first and last
+    # rows and the rows in keep (positions, e.g. Max-Q) are always kept, and without every and tolerance every row is kept
+    if every is None and tolerance is None:
+        return history
+    n = len(history)
+    kept = np.zeros(n, dtype=bool)
+    kept[[0, n - 1]] = True
+    kept[list(keep)] = True
+    if every is not None:
+        kept[::every] = True
+    if tolerance is not None:
+        t = history['t'].to_numpy()
+        values = history.drop(columns='t').to_numpy()
+        span = np.ptp(values, axis=0)
+        values = values / np.where(span > 0, span, 1)
+        index = np.flatnonzero(kept)
+        segments = list(zip(index[:-1], index[1:]))
+        while segments:
+            i, j = segments.pop()
+            if j - i < 2:
+                continue
+            f = ((t[i + 1:j] - t[i]) / (t[j] - t[i]))[:, None]
+            error = np.abs(values[i + 1:j] - (values[i] + f * (values[j] - values[i]))).max(axis=1)
+            k = int(np.argmax(error))
+            if error[k] > tolerance:
+                kept[i + 1 + k] = True
+                segments += [(i, i + 1 + k), (i + 1 + k, j)]
+    return history[kept].reset_index(drop=True)
+
+def integrateLanes(trajectory, lanes, dt=1, method='euler'):
+    # Integrates the lanes of a trajectory and returns their final state, for the worker processes of Trajectory.monteCarlo
+    return trajectory.integrate(lanes, dt, compact_every=20, method=method)
+
+def missionLosses(mission):
+    # Gravity and drag losses (m/s) of a Mission after set_dV_reqs(), for Trajectory.screen_losses. These are design estimates,
+    # not bounds, and can exceed the losses of feasible candidates, so screening with them may drop feasible trajectories
+    return (mission.dV_reqs[3] + mission.dV_reqs[4]) * 1000
+
+def initTrajectory(LV):
+    # Initializes the Trajectory of a sized LaunchVehicle from the TrajReqs csv written by LV.generateTrajReqs()
+    step1, step2, step3 = loadTrajReqs(LV.name, LV.PL)
+    mission = Trajectory.mission_numbers[LV.Mission.input[0]]
+    trajectory = Trajectory(LV.name, step1, step2, step3, mission, degrees(LV.Mission.lat), LV.PL)
+    trajectory.useCdTables(loadCdTables(LV.name))
+    return trajectory
+
+class Trajectory:
+    """Batched gravity-turn trajectory of a launch vehicle. Every candidate of the sweep grid is a lane of NumPy arrays and all lanes are integrated at once"""
+
+    # CONSTANTS OF EARTH
+    mu = 3.986e14  # gravitational parameter of earth (m^3/s^2)
+    g0 = 9.80665  # gravity at sea level (m/s^2)
+    R_earth = 6378000  # radius of earth (m)
+    h0 = 7640  # scale height of the exponential atmosphere (m)
+    rho0 = 1.225  # air density at sea level of the exponential atmosphere (kg/m^3)
+    atmosphere = 'us76'  # 'us76' (tabulated US-76, see 'Atmosphere.py') or 'exponential' (rho0 * exp(-h / h0) of the MATLAB script)
+    atmosphere_dh = 100  # altitude step of the atmosphere table (m)
+    drag_model = 'constant'  # 'constant' (the Cd of the step vectors as in the MATLAB script) or 'mach' (Cd(Mach) table of each stage, see setCdTables), set by useCdTables
+    cd_mach_profile = ([0, 0.6, 0.8, 1.0, 1.2, 1.5, 2, 3, 5, 10], [1, 1, 1.1, 1.6, 1.75, 1.55, 1.3, 1.05, 0.85, 0.75])  # default Cd(Mach) relative to the subsonic Cd of the step
+    mach_dM = 0.005  # Mach step of the drag tables, looked up at the nearest step
+    mach_max = 10  # the drag tables hold their last value above this Mach number
+    wind_profile = None  # Wind.WindProfile flown by every lane, None for still air
+    v_equator = 465.1  # equatorial velocity (m/s)
+    launch_sites = Mission.launch_sites  # latitude of the launch sites of Mission.set_dV_reqs (deg)
+
+    # GRAVITY-TURN PARAMETERS OF 'Trajectory_TL_0407.m'
+    gamma_cutoff = radians(1)  # flight path angle that ends the gravity turn (rad)
+    pitch_window = (400, 600)  # altitudes between which the pitch kick is applied (m)
+    pitch_kick_dt = 1  # the pitch kick is applied once per MATLAB time step, i.e. as a rate of pitch_kick per second (s)
+
+    # PITCH PROGRAMS OF programTrade, code of lanes['program'] is the position in pitch_programs
+    pitch_programs = ['gravity turn', 'linear tangent', 'piecewise linear']
+    steer_stage = 1  # the steered programs fly the gravity turn until ignition of this stage (0 is the first) and steer its thrust from then on
+    pitch_knots = (60, 120, 240)  # times after the start of steering of the pitch angles pitch_1, pitch_2, ... of the piecewise linear program (s)
+    program_names = ['program', 'kick_h', 'kick_dh', 'steer_rate', 'pitch_1', 'pitch_2', 'pitch_3']  # one pitch_ per knot
+    program_grid = {  # parameter axes of every program family swept by programTrade, with the grid axes
+        'gravity turn': {'kick_h': [200, 400, 800], 'kick_dh': [100, 200, 400]},  # start and height of the pitch kick window (m)
+        'linear tangent': {'steer_rate': [0, 0.002, 0.004, 0.006, 0.008]},  # rate of decrease of the tangent of the pitch angle (1/s)
+        'piecewise linear': {'pitch_1': np.radians([10, 20, 30]), 'pitch_2': np.radians([0, 10, 20]), 'pitch_3': np.radians([-10, 0, 10])},  # (rad)
+    }
+    coast_time = 5  # coast between stage separation and ignition of the next stage (s)
+    max_steps = 3000  # cap on the step count of a trajectory
+    max_time = 3000  # cap on the flight time of a trajectory, the MATLAB step cap at dt = 1 s (s)
+    kepler_coast = True  # the coast after burnout of the last stage above kepler_h is propagated analytically, see keplerCoast
+    kepler_h = 150000  # altitude above which the drag of a coasting vehicle is negligible (m)
+
+    # ADAPTIVE (RK45) INTEGRATOR
+    y_names = ['v', 'gamma', 'h', 'x', 'm']  # integrated state
+    rtol = 1e-4  # relative error tolerance, about the accuracy of the Euler sweep at dt = 1 s
+    atol = np.array([1e-1, 1e-5, 1, 10, 1e-1])[:, None]  # absolute error tolerance of v (m/s), gamma (rad), h (m), x (m), m (kg)
+    max_step = 60  # largest step the adaptive integrator takes (s)
+    min_step = 1e-6  # smallest step; a lane whose error is still above the tolerance at this step has failed (s)
+    max_rejections = 50  # consecutive rejected steps after which a lane has failed
+    event_tol = 1e-3  # largest overshoot of a located event (s)
+    event_iterations = 10  # iterations of the Illinois method locating an event on the dense output of a step
+    # Dormand-Prince 5(4) coefficients
+    rk45_c = [0, 1/5, 3/10, 4/5, 8/9, 1]
+    rk45_a = [[],
+              [1/5],
+              [3/40, 9/40],
+              [44/45, -56/15, 32/9],
+              [19372/6561, -25360/2187, 64448/6561, -212/729],
+              [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]]
+    rk45_b = [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]
+    rk45_e = [71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40]  # difference between the 5th and 4th order weights
+    rk45_p = [[1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],  # dense output: weights of theta**1..4
+              [0, 0, 0, 0],
+              [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+              [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+              [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+              [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+              [0, 40617522/29380423, -110615467/29380423, 69997945/29380423]]
+    # PRUNING: reasons a lane is aborted during the sweep, by code (0 is not pruned)
+    prune_reasons = ['', 'altitude', 'circularization', 'inclination', 'dominated', 'step size']  # 'step size' is set by rk45Step, pruning or not
+    screen_losses = 0  # delta-v losses subtracted from the ideal delta-v by preScreen (m/s)
+    chunk_size = 100000  # largest number of candidates integrated as one batch by runCandidates
+    cache_dir = 'LVTrajectory/Cache'  # directory of the sweep results cached by sweep(cache=True)
+    cache_version = 1  # part of every cache key, increase it when the trajectory model changes in a way the settings do not show
+    dispersions = {'thrust': 0.01, 'Isp': 0.005, 'Cd': 0.05, 'dry_mass': 0.02, 'wind': 10}  # 1-sigma of the dispersions of monteCarlo (relative, wind in m/s)
+    percentiles = [1, 5, 50, 95, 99]  # percentiles of the Monte Carlo outputs
+    precision = 'float64'  # float type of the lanes, state and tables of the integrator, 'float32' for screening sweeps (see setPrecision)
+    verify_top_k = 10  # candidates of a reduced precision sweep flown again in float64 by verifyPrecision
+    infeasible_cost = 1e4  # least cost of an infeasible point in optimize, above any feasible time (s) or delta-v (m/s)
+
+    mission_numbers = {'One': 1, 'Two': 2}
+    mission_sites = {'One': 'KSC', 'Two': 'Vandenberg'}  # launch site of each mission in 'MainLVDesign.py'
+    shared_thrust = {'Latona-2': {1: ('Latona-1', 0)}}  # step thrusts taken from another vehicle, {name: {step: (other name, other step)}}: the Latona-2 step 2 gets the Latona-1 step 1 thrust of 'Trajectory_Run_TL_0324.m', but flies serially after step 1 (see loadTrajReqs)
+    dv_circ_limits = {'Latona': {1: 1000, 2: 1000}, 'Minerva': {1: 500, 2: 1000}, 'Zephyr': {1: 500, 2: 1000}}  # delta-v to circularize limits (m/s)
+
+    # Column layout of the MATLAB 'Results' matrix, the last three columns are added by the Python trajectory
+    param_names = ['scale_factor_1', 'scale_factor_2', 'scale_factor_3', 'pitch_kick', 'mleft_1', 'mleft_2', 'mleft_3']
+    results_names = param_names + ['count', 'delta_v_total', 'delta_v_circularization', 'h', 'v', 't', 'evaluations', 'pruned', 'pruned_step', 'check']
+    insertion_names = ['t', 'v', 'gamma', 'h', 'x', 'm']  # state kept at insertion, the cut-off of the last stage
+    objective = 'delta_v_circularization'  # results column minimized by the optimal trajectory, column 10 of the MATLAB results as in the run script
+    max_q_names = ['Time (s)', 'Thrust (N)', 'Max-q (Pa)', 'Velocity (m/s)', 'Mass Burned (kg)', 'Height (m)', 'Gamma (rad)', 'Air Density (kg/m^3)',
+                   'Angle of Attack (rad)', 'Wind Speed (m/s)', 'q-alpha (Pa rad)']
+
+    def __init__(self, name, step1, step2, step3, mission, launch_latitude, payload=0):
+        self.name = name
+        self.family = name.split('-')[0]  # 'Latona', 'Minerva' or 'Zephyr'
+        self.steps = np.array([step1, step2, step3], dtype=float)  # rows: [Cd, Radius, mi, mf, Thrust, Isp] of each step
+        self.num_stages = int(np.count_nonzero(self.steps[:, 2]))
+        self.mission = mission
+        self.launch_latitude = launch_latitude  # latitude of launch site (deg)
+        self.payload = payload  # payload included in the masses of the last step by loadTrajReqs (kg)
+        self.v_ls = self.v_equator * cos(radians(launch_latitude))  # speed of launch site (m/s)
+        if mission == 1:
+            final_alt = 500000  # final orbit altitude (m)
+            self.inc = 60  # inclination (deg)
+            self.h_max = 250000  # highest altitude accepted at the end of the gravity turn (m)
+        elif mission == 2:
+            final_alt = 550000  # final orbit altitude (m)
+            self.inc = 95  # inclination (deg)
+            self.h_max = 450000  # highest altitude accepted at the end of the gravity turn (m)
+        else:
+            raise ValueError('Mission ' + str(mission) + ' does not exist in this simulation!')
+        self.rf = final_alt + self.R_earth  # distance between final orbit altitude and center of earth (m)
+        self.dv_inc_change = 2 * sqrt(self.mu / self.rf) * sin(radians(10) / 2) if mission == 2 else 0  # 10 deg inclination change at the final orbit (m/s)
+        self.dv_circ_max = self.dv_circ_limits.get(self.family, {}).get(mission, np.inf)
+        self.setPrecision(self.precision)
+        self.reducers = [MaxQ()]  # streaming reducers run by the integrator, see 'Reducers.py'
+        self.reductions = {}
+        self.precision_report = None  # float64 verification of a reduced precision sweep, see verifyPrecision
+        self.ranking_changed = False
+        self.initGrid()
+
+    def initGrid(self):
+        # Iterators of the MATLAB sweep. The last stage keeps 10-40% of its propellant, the others burn out.
+        # The stage 3 thrust scale factor is not iterated for two-stage vehicles since it has no effect.
+        mleft = np.linspace(0.1, 0.4, 7)  # percentage of propellant remaining
+        self.grid = {
+            'scale_factor_1': np.linspace(0.8, 1.2, 9),
+            'scale_factor_2': np.linspace(0.7, 1.1, 9),
+            'scale_factor_3': np.linspace(0.7, 1.1, 9) if self.num_stages == 3 else np.array([1.0]),
+            'pitch_kick': np.radians(np.linspace(0.05, 1.5, 30)),  # (rad)
+            'mleft_1': np.array([0.0]),
+            'mleft_2': mleft if self.num_stages == 2 else np.array([0.0]),
+            'mleft_3': mleft if self.num_stages == 3 else np.array([0.0]),
+        }
+
+    def gridCandidates(self, grid=None):
+        # Returns the full factorial of the grid axes as a dict of 1-D arrays, in the loop order of the MATLAB sweep
+        if grid is None:
+            grid = self.grid
+        axes = np.meshgrid(*[np.asarray(grid[i], dtype=float) for i in self.param_names], indexing='ij')
+        return {name: axis.ravel() for name, axis in zip(self.param_names, axes)}
+
+    def initLanes(self, candidates, steps=None):
+        # Expands the step vectors into per-lane stage arrays of shape (3, number of lanes). steps overrides self.steps, with
+        # the same rows and columns and optionally a last axis of lanes (e.g. the dispersed steps of monteCarlo).
+        # The stage masses are stack masses: stage k starts with steps k, k+1, ... and burns out with the structure of step k
+        n = len(candidates['pitch_kick'])
+        steps = np.asarray(self.steps if steps is None else steps, dtype=float)
+        Cd, radius, mi_step, mf_step, thrust, Isp = [np.array(np.broadcast_to(steps[:, i].reshape(3, -1), (3, n))) for i in range(6)]
+        m_above = np.stack([mi_step[1] + mi_step[2], mi_step[2], np.zeros(n)])  # mass of the steps above each step (kg)
+        mi = mi_step + m_above  # stage initial mass (kg)
+        mf = mf_step + m_above  # stage final mass (kg)
+        scale = np.stack([candidates['scale_factor_1'], candidates['scale_factor_2'], candidates['scale_factor_3']])
+        mleft = np.stack([candidates['mleft_1'], candidates['mleft_2'], candidates['mleft_3']])
+        lanes = {
+            'CdS': Cd * pi * radius**2,  # drag coefficient times cross-sectional area (m^2)
+            'mi': mi,
+            'mf': mf,
+            'Isp': Isp,
+            'thrust': thrust * scale,  # (N)
+            'mcut': mf + mleft * (mi - mf),  # mass at which the stage engine is cut off (kg)
+            'pitch_kick': np.asarray(candidates['pitch_kick'], dtype=float),  # (rad)
+            'num_stages': np.full(n, self.num_stages),
+        }
+        if 'v_ls' in candidates:
+            lanes['v_ls'] = np.asarray(candidates['v_ls'], dtype=float)  # launch site velocity of every lane, see siteVelocity (m/s)
+        if 'program' in candidates:
+            # pitch program of every lane, see programCandidates and steeringAngle
+            lanes['program'] = np.asarray(candidates['program'], dtype=int)
+            for name in ['kick_h', 'kick_dh', 'steer_rate']:
+                lanes[name] = np.asarray(candidates[name], dtype=float)
+            lanes['pitch_values'] = np.stack([np.asarray(candidates['pitch_' + str(i + 1)], dtype=float) for i in range(len(self.pitch_knots))])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lanes['mdot'] = np.where(lanes['Isp'] > 0, lanes['thrust'] / (lanes['Isp'] * self.g0), 0)  # mass flow (kg/s)
+        return {name: value.astype(self.precision) if value.dtype.kind == 'f' else value for name, value in lanes.items()}
+
+    def initState(self, lanes):
+        # State of every lane at lift-off, including the arrays of the reducers
+        n = lanes['pitch_kick'].size
+        dtype = self.precision
+        state = {
+            't': np.zeros(n, dtype),  # (s)
+            'v': np.zeros(n, dtype),  # (m/s)
+            'gamma': np.full(n, pi/2, dtype),  # flight path angle (rad)
+            'h': np.zeros(n, dtype),  # (m)
+            'x': np.zeros(n, dtype),  # downrange distance (m)
+            'm': lanes['mi'][0].copy(),  # (kg)
+            'stage': np.zeros(n, dtype=int),  # 0, 1 or 2
+            'burning': np.ones(n, dtype=bool),
+            't_ignition': np.zeros(n, dtype),  # time the next stage ignites after separation (s)
+            'count': np.ones(n, dtype=int),
+            'evaluations': np.zeros(n, dtype=int),  # derivative evaluations
+            'pruned': np.zeros(n, dtype=int),  # code of prune_reasons
+            'pruned_step': np.full(n, -1),  # step count at which the lane was pruned
+        }
+        for name in ['CdS', 'thrust', 'mdot', 'mcut']:
+            state[name] = lanes[name][0].copy()  # parameters of the current stage
+        if 'program' in lanes:
+            state['steer_t0'] = np.full(n, 0 if self.steer_stage == 0 else np.nan, dtype)  # time steering started, NaN before (s)
+            state['steer_gamma0'] = np.full(n, pi/2 if self.steer_stage == 0 else np.nan, dtype)  # gamma when steering started (rad)
+        for name in self.insertion_names:
+            state['insertion_' + name] = np.full(n, np.nan, dtype)  # state at cut-off of the last stage
+        for reducer in self.reducers:
+            reducer.init(self, lanes, state)
+        return state
+
+    def derivatives(self, lanes, state, kick=None):
+        # Returns the time derivatives of v, gamma, h, x, m of every lane, and the dynamic pressure, air density and thrust.
+        # kick overrides which lanes are in the pitch kick window (the adaptive integrator holds it fixed over a step).
+        # Lanes fly through the wind of wind() (the wind_profile and the steady 'wind' of the lanes): the dynamic pressure and drag
+        # follow the airspeed, and the drag has a component normal to the velocity that turns the flight path once the vertical
+        # rise below the pitch kick window is over (the vertical rise is held by the guidance). Lanes with a 'drag_factor' (of
+        # each stage, shape (3, number of lanes)) scale their drag. Lanes with a pitch program steer their thrust by steeringAngle
+        stage, burning = state['stage'], state['burning']
+        v, gamma, h, m = state['v'], state['gamma'], state['h'], state['m']
+        rho, g, mach_scale = self.air(h)  # air density (kg/m^3), local gravity (m/s^2) and Mach steps per airspeed (s/m)
+        v_air, v_along, v_across = self.airspeed(lanes, state)[:3]
+        q = 0.5 * rho * v_air**2  # dynamic pressure (Pa)
+        drag = q * self.dragArea(state, v_air, mach_scale)  # (N)
+        if 'drag_factor' in lanes:
+            drag = drag * lanes['drag_factor'][stage, np.arange(stage.size)]
+        thrust = np.where(burning, state['thrust'], 0)  # (N)
+        m_dot = np.where(burning, -state['mdot'], 0)  # (kg/s)
+        v_safe = np.where(v > 0, v, 1)  # gamma is held until the vehicle is moving
+        gamma_dot = np.where(v > 0, -(g / v_safe - v_safe / (self.R_earth + h)) * np.cos(gamma), 0)
+        if v_across is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drag_ratio = np.where(v_air > 0, drag / v_air, 0)
+            turning = (v > 0) & ((h >= self.kickWindow(lanes)[0]) | (stage > 0))
+            gamma_dot = gamma_dot - np.where(turning, drag_ratio * v_across / (m * v_safe), 0)
+            drag = drag_ratio * v_along  # drag along the velocity (N)
+        thrust_along = thrust  # thrust along the velocity (N)
+        if 'program' in lanes:
+            steer = self.steeringAngle(lanes, state)
+            thrust_along = thrust * np.cos(steer)
+            gamma_dot = gamma_dot + thrust * np.sin(steer) / (m * v_safe)
+        v_dot = (thrust_along - drag) / m - g * np.sin(gamma)
+        if kick is None:
+            kick = self.pitchKicking(lanes, state)
+        gamma_dot = gamma_dot - kick * lanes['pitch_kick'] / self.pitch_kick_dt
+        h_dot = v * np.sin(gamma)
+        x_dot = v * np.cos(gamma) * self.R_earth / (self.R_earth + h)
+        return v_dot, gamma_dot, h_dot, x_dot, m_dot, q, rho, thrust
+
+    def wind(self, lanes, state):
+        # Wind in the trajectory plane (positive downrange) and crosswind of every lane (m/s): the wind_profile at its altitude
+        # plus the steady 'wind' of the lanes (Monte Carlo dispersions), or None and None in still air
+        if self.wind_profile is None:
+            return (lanes['wind'], 0) if 'wind' in lanes else (None, None)
+        wind, crosswind = self.wind_profile.at(state['h'])
+        if 'wind' in lanes:
+            wind = wind + lanes['wind']
+        return wind, crosswind
+
+    def airspeed(self, lanes, state):
+        # Airspeed of every lane and its components along the velocity, normal to it in the trajectory plane and normal to the
+        # plane (m/s); the normal components are None in still air
+        v = state['v']
+        wind, crosswind = self.wind(lanes, state)
+        if wind is None:
+            return v, v, None, None
+        v_along = v - wind * np.cos(state['gamma'])
+        v_across = wind * np.sin(state['gamma'])
+        return np.sqrt(v_along**2 + v_across**2 + crosswind**2), v_along, v_across, crosswind
+
+    def angleOfAttack(self, lanes, state, crosswind=0):
+        # Angle of attack (rad) of every lane, whose body is along its velocity, in its wind and an extra crosswind (m/s)
+        v_along, v_across, v_cross = self.airspeed(lanes, state)[1:]
+        if v_across is None:
+            v_across, v_cross = 0, 0
+        return np.arctan2(np.hypot(v_across, v_cross + crosswind), v_along)
+
+    def air(self, h):
+        # Air density (kg/m^3), local gravity (m/s^2) and, for the Mach drag model, the Mach steps of drag_area per airspeed
+        # (1 / (speed of sound * mach_dM), s/m, else None) at the altitudes h. The density is interpolated from the US-76 table
+        # unless the atmosphere is the exponential one of the MATLAB script; the inverse-square gravity has no transcendental
+        # function and is cheaper to compute than to look up
+        g = self.g0 / (1 + h / self.R_earth)**2
+        mach = self.drag_model == 'mach'
+        if self.atmosphere == 'exponential':
+            return self.rho0 * np.exp(-h / self.h0), g, interpolate(self.air_table, h, ('mach_scale',))[0] if mach else None
+        if mach:
+            rho, mach_scale = interpolate(self.air_table, h, ('rho', 'mach_scale'))
+            return rho, g, mach_scale
+        return interpolate(self.air_table, h)[0], g, None
+
+    def densityGradient(self, h):
+        # Relative rate of change of the air density with altitude, d(ln rho)/dh (1/m)
+        if self.atmosphere == 'exponential':
+            return np.full(np.shape(h), -1 / self.h0)
+        return interpolate(self.air_table, h, ('dlnrho_dh',))[0]
+
+    def setCdTables(self, tables=None):
+        # Sets the Cd(Mach) table of each step from a list of three (Mach, Cd) pairs of arrays; a None list or entry takes the
+        # cd_mach_profile scaled by the Cd of the step vector. The tables are resampled every mach_dM into one array of drag areas
+        # (Cd times cross-sectional area, m^2) of all stages, so the drag of every lane is one lookup. The air table gets the
+        # Mach steps per airspeed of every altitude ('mach_scale'), so the index of the lookup needs no division by the speed of sound
+        mach = np.arange(0, self.mach_max + self.mach_dM, self.mach_dM)
+        self.mach_size = mach.size  # drag areas of each stage in drag_area
+        area = pi * self.steps[:, 1]**2  # cross-sectional area of each step (m^2)
+        tables = tables if tables is not None else [None] * 3
+        self.cd_tables = []
+        for i in range(3):
+            if tables[i] is None:
+                tables_mach, cd = np.array(self.cd_mach_profile[0], dtype=float), self.steps[i, 0] * np.array(self.cd_mach_profile[1])
+            else:
+                tables_mach, cd = np.asarray(tables[i][0], dtype=float), np.asarray(tables[i][1], dtype=float)
+            self.cd_tables.append((tables_mach, cd))
+        self.drag_area = np.concatenate([np.interp(mach, m, cd) * area[i] for i, (m, cd) in enumerate(self.cd_tables)]).astype(self.precision)
+        mach_scale = addSlopes({'mach_scale': 1 / (atmosphereTable(self.atmosphere_dh)['a'] * self.mach_dM)})
+        self.air_table = dict(self.air_table, **{name: value.astype(self.precision) for name, value in mach_scale.items()})  # the cached table is not modified
+
+    def useCdTables(self, tables):
+        # Flies the Cd(Mach) tables of loadCdTables with drag_model 'mach'; without tables (None) the constant Cd of the step
+        # vectors is kept, since the generic cd_mach_profile is no measured drag of the vehicle
+        if tables is not None:
+            self.setCdTables(tables)
+            self.drag_model = 'mach'
+
+    def setPrecision(self, precision='float64'):
+        # Sets the float type of the lanes, state and tables of the integrator: 'float64', or 'float32' for screening sweeps over
+        # millions of candidates, which halves the memory traffic of every step; a float32 sweep verifies its best candidates
+        # in float64 (verifyPrecision). The Cd(Mach) tables are kept
+        self.precision = precision
+        self.air_table = atmosphereTable(self.atmosphere_dh, dtype=precision)
+        self.setCdTables(getattr(self, 'cd_tables', None))
+
+    def dragArea(self, state, v, mach_scale):
+        # Drag coefficient times cross-sectional area (m^2) of every lane at airspeed v (m/s), with the Mach steps per airspeed
+        # mach_scale of air(). On 20000 Zephyr-1 lanes the Mach drag model adds about 3% to derivatives() (15% with the speed of
+        # sound interpolated and divided per step), less than the run-to-run spread of a whole sweep
+        if self.drag_model == 'constant':
+            return state['CdS']
+        size = self.mach_size
+        x = np.multiply(v, mach_scale)
+        x += 0.5
+        np.clip(x, 0, size - 1, out=x)
+        i = x.astype(np.intp)
+        i += state['stage'] * size
+        return self.drag_area[i]
+
+    def kickWindow(self, lanes):
+        # Altitudes between which every lane applies its pitch kick (m): the kick_h and kick_dh of its pitch program, else pitch_window
+        if 'kick_h' in lanes:
+            return lanes['kick_h'], lanes['kick_h'] + lanes['kick_dh']
+        return self.pitch_window
+
+    def pitchKicking(self, lanes, state):
+        h = state['h']
+        low, high = self.kickWindow(lanes)
+        return state['burning'] & (state['stage'] == 0) & (h >= low) & (h <= high)
+
+    def steeringAngle(self, lanes, state):
+        # Angle of the thrust above the velocity of every lane (rad) from its pitch program. The gravity turn and the steered
+        # programs before ignition of steer_stage fly at zero angle; from then on the linear tangent program holds the pitch
+        # angle theta of tan(theta) = tan(gamma_0) - steer_rate * tau and the piecewise linear program interpolates theta in tau
+        # from gamma_0 through the pitch_values at pitch_knots, holding the last one, where tau is the time since steering started
+        # and gamma_0 the flight path angle then. Coasting lanes have no thrust to steer
+        tau = state['t'] - state['steer_t0']
+        steering = state['burning'] & (tau >= 0) & (lanes['program'] > 0)
+        tau = np.where(steering, tau, 0)
+        gamma_0 = np.where(steering, state['steer_gamma0'], 0)
+        linear_tangent = np.arctan(np.tan(gamma_0) - lanes['steer_rate'] * tau)
+        knots = np.array((0,) + tuple(self.pitch_knots), dtype=tau.dtype)
+        values = np.vstack([gamma_0, lanes['pitch_values']])
+        j = np.clip(np.searchsorted(knots, tau, side='right') - 1, 0, knots.size - 2)
+        f = np.clip((tau - knots[j]) / (knots[j + 1] - knots[j]), 0, 1)
+        idx = np.arange(tau.size)
+        piecewise = values[j, idx] + f * (values[j + 1, idx] - values[j, idx])
+        pitch = np.where(lanes['program'] == self.pitch_programs.index('linear tangent'), linear_tangent, piecewise)
+        return np.where(steering, pitch - state['gamma'], 0)
+
+    def stageEvents(self, lanes, state, active):
+        # Burnout, separation and ignition of every active lane. At separation the mass drops to the initial mass of the
+        # next stage, which coasts for coast_time before it ignites; after the last stage burns out the vehicle coasts.
+        # Ignition of steer_stage starts the steering of the lanes with a pitch program
+        idx = np.arange(state['v'].size)
+        stage = state['stage']
+        burnout = active & state['burning'] & (state['m'] <= state['mcut'])
+        if burnout.any():
+            separate = burnout & (stage < lanes['num_stages'] - 1)
+            state['burning'] = state['burning'] & ~burnout
+            state['stage'] = np.where(separate, stage + 1, stage)
+            state['m'] = np.where(separate, lanes['mi'][state['stage'], idx], state['m'])
+            state['t_ignition'] = np.where(separate, state['t'] + self.coast_time, np.where(burnout, np.inf, state['t_ignition']))
+            for name in ['CdS', 'thrust', 'mdot', 'mcut']:
+                state[name] = np.where(separate, lanes[name][state['stage'], idx], state[name])
+            insertion = burnout & ~separate
+            for name in self.insertion_names:
+                state['insertion_' + name] = np.where(insertion, state[name], state['insertion_' + name])
+            for reducer in self.reducers:
+                reducer.staging(self, lanes, state, burnout, separate)
+        ignition = active & ~state['burning'] & (state['t'] >= state['t_ignition'])
+        state['burning'] = state['burning'] | ignition
+        if 'steer_t0' in state:
+            start = ignition & (state['stage'] == self.steer_stage)
+            state['steer_t0'] = np.where(start, state['t'], state['steer_t0'])
+            state['steer_gamma0'] = np.where(start, state['gamma'], state['steer_gamma0'])
+
+    def terminated(self, state, max_steps, end='turn'):
+        # The gravity turn ends once gamma drops below gamma_cutoff (end 'turn') or at insertion, the cut-off of the last stage
+        # (end 'insertion'), or when the vehicle falls back to the ground, or the step cap is hit, or the lane was aborted
+        done = (state['gamma'] <= self.gamma_cutoff) if end == 'turn' else ~np.isnan(state['insertion_t'])
+        return done | (state['h'] < 0) | (state['count'] >= max_steps) | (state['t'] >= self.max_time) | (state['pruned'] > 0)
+
+    def reduceStep(self, lanes, state, q, rho, thrust, active):
+        # Passes the state of a step of the active lanes to every reducer, e.g. the running Max-Q snapshot of Reducers.MaxQ
+        for reducer in self.reducers:
+            reducer.step(self, lanes, state, active, q, rho, thrust)
+
+    def eulerStep(self, lanes, state, active, dt):
+        # Advances every active lane by one explicit Euler step of dt
+        v_dot, gamma_dot, h_dot, x_dot, m_dot, q, rho, thrust = self.derivatives(lanes, state)
+        self.reduceStep(lanes, state, q, rho, thrust, active)
+        for name, rate in [('v', v_dot), ('gamma', gamma_dot), ('h', h_dot), ('x', x_dot)]:
+            state[name] = np.where(active, state[name] + rate * dt, state[name])
+        m_new = np.maximum(state['m'] + m_dot * dt, state['mcut'])  # engines cut off exactly at mcut
+        state['m'] = np.where(active & state['burning'], m_new, state['m'])
+        state['t'] = np.where(active, state['t'] + dt, state['t'])
+        state['count'] = state['count'] + active
+        state['evaluations'] = state['evaluations'] + active
+        self.stageEvents(lanes, state, active)
+
+    def rates(self, lanes, state, y, kick):
+        # Derivatives of the integrated state y (rows of y_names) with the stage and pitch kick of state held fixed
+        trial = dict(state, v=y[0], gamma=y[1], h=y[2], x=y[3], m=y[4])
+        v_dot, gamma_dot, h_dot, x_dot, m_dot, q, rho, thrust = self.derivatives(lanes, trial, kick)
+        return np.stack([v_dot, gamma_dot, h_dot, x_dot, m_dot]), q, rho, thrust
+
+    def dynamicPressure(self, lanes, y):
+        # Dynamic pressure (Pa) and air density (kg/m^3) of the integrated states y (rows of y_names) of lanes, as in derivatives
+        rho = self.air(y[2])[0]
+        v_air = self.airspeed(lanes, {'v': y[0], 'gamma': y[1], 'h': y[2]})[0]
+        return 0.5 * rho * v_air**2, rho
+
+    def rk45Step(self, lanes, state, active, dt):
+        # One adaptive Dormand-Prince 5(4) step of every active lane with its own step size state['dt'].
+        # The steps end exactly on the analytic events (burnout at mcut, ignition at the end of the separation coast). A step
+        # that crosses a located event (entry to and exit from the pitch kick window, the gamma cutoff, and maxima of the dynamic
+        # pressure so Max-Q is not missed between large steps) is cut back to within event_tol past the event, found by the
+        # Illinois method on the dense output of the step, so the discontinuities of the gravity turn are never integrated over
+        # and no step is flown again for an event. A lane that cannot meet the tolerance (rejected at min_step, or
+        # max_rejections times in a row) is aborted with the prune reason 'step size'
+        y = np.stack([state[name] for name in self.y_names])
+        n = y.shape[1]
+        burning = state['burning']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dt_burnout = np.where(burning & (state['mdot'] > 0), (state['m'] - state['mcut']) / state['mdot'], np.inf)
+        dt_ignition = np.where(burning, np.inf, state['t_ignition'] - state['t'])
+        dt_try = np.minimum(np.minimum(state['dt'], self.max_step), np.minimum(dt_burnout, dt_ignition))
+        dt_try = np.maximum(dt_try, self.min_step)
+        kick = self.pitchKicking(lanes, state)
+
+        k_0, q_0, rho_0, _ = self.rates(lanes, state, y, kick)
+        k = [k_0]
+        for i in range(1, 6):
+            y_stage = y + dt_try * sum(a * k_j for a, k_j in zip(self.rk45_a[i], k))
+            k.append(self.rates(lanes, state, y_stage, kick)[0])
+        y_new = y + dt_try * sum(b * k_j for b, k_j in zip(self.rk45_b, k) if b != 0)
+        k_new, q, rho, thrust = self.rates(lanes, state, y_new, kick)
+        k.append(k_new)
+        state['evaluations'] = state['evaluations'] + 7 * active
+
+        # error control
+        error = dt_try * sum(e * k_j for e, k_j in zip(self.rk45_e, k) if e != 0)
+        scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+        error = np.sqrt(np.mean((error / scale)**2, axis=0))
+        with np.errstate(divide='ignore'):
+            factor = np.clip(0.9 * error**-0.2, 0.2, 10)
+        accept = active & (error <= 1)
+
+        # located events: the event functions (rows) at both ends of the step and the first one crossed by the secant
+        window = burning & (state['stage'] == 0)
+
+        def events(y_t, f_t, q_t, rho_t, low, high):
+            # kick window entry and exit, gamma cutoff and rate of change of the dynamic pressure (Pa/s)
+            return np.stack([y_t[2] - low, y_t[2] - high, y_t[1] - self.gamma_cutoff,
+                             q_t * self.densityGradient(y_t[2]) * f_t[2] + rho_t * y_t[0] * f_t[0]])
+
+        low, high = self.kickWindow(lanes)
+        e_0, e_1 = events(y, k_0, q_0, rho_0, low, high), events(y_new, k_new, q, rho, low, high)
+        crossed = np.stack([window & ((e_0[0] >= 0) != (e_1[0] >= 0)), window & ((e_0[1] >= 0) != (e_1[1] >= 0)),
+                            (e_0[2] > 0) & (e_1[2] <= 0), (e_0[3] > 0) & (e_1[3] <= 0)])
+        theta = np.where(crossed, e_0 / np.where(crossed, e_0 - e_1, 1), 1)
+        first = np.argmin(theta, axis=0)
+        idx = np.arange(n)
+        event = accept & ((1 - theta[first, idx]) * dt_try > self.event_tol)
+
+        # the first event of the lanes that cross one is bracketed by the Illinois method on the dense output of the step,
+        # y + dt_try * theta * (Q_1 + theta * (Q_2 + theta * (Q_3 + theta * Q_4))), which needs no new evaluation. A located
+        # event ends the step just past it; a lane whose bracket is still wider than event_tol (rare) flies the step again
+        dt_step, overshoot, retry = dt_try, event, np.zeros(n)
+        if event.any():
+            j = np.flatnonzero(event)
+            Q = np.tensordot(np.array(self.rk45_p).T, np.stack(k)[:, :, j], axes=(1, 0))  # (4, 5, lanes with an event)
+            y_j, dt_j, first_j, m = y[:, j], dt_try[j], first[j], np.arange(j.size)
+            lanes_j = compactLanes({name: lanes[name] for name in ['wind'] if name in lanes}, j)
+            bounds_j = [np.broadcast_to(bound, (n,))[j] for bound in (low, high)]
+
+            def dense(theta):
+                # state and its derivatives at the fraction theta of the step
+                p, f = Q[3], 4 * Q[3]
+                for i in (2, 1, 0):
+                    p, f = Q[i] + theta * p, (i + 1) * Q[i] + theta * f
+                return y_j + dt_j * theta * p, f
+
+            lo, hi = np.zeros(j.size), np.ones(j.size)
+            g_lo, g_hi = e_0[first_j, j], e_1[first_j, j]
+            positive = g_lo > 0
+            last = np.zeros(j.size)
+            for _ in range(self.event_iterations):
+                if not ((hi - lo) * dt_j > self.event_tol).any():
+                    break
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    theta_i = np.where(g_hi != g_lo, (lo * g_hi - hi * g_lo) / (g_hi - g_lo), (lo + hi) / 2)
+                theta_i = np.clip(theta_i, lo, hi)
+                y_i, f_i = dense(theta_i)
+                g_i = events(y_i, f_i, *self.dynamicPressure(lanes_j, y_i), *bounds_j)[first_j, m]
+                before = (g_i > 0) == positive
+                g_hi = np.where(before & (last == 1), g_hi / 2, g_hi)  # Illinois: halve the end that was kept twice
+                g_lo = np.where(~before & (last == -1), g_lo / 2, g_lo)
+                lo, g_lo = np.where(before, theta_i, lo), np.where(before, g_i, g_lo)
+                hi, g_hi = np.where(before, hi, theta_i), np.where(before, g_hi, g_i)
+                last = np.where(before, 1, -1)
+            located = (hi - lo) * dt_j <= self.event_tol
+            y_cut = dense(hi)[0]
+            q_cut, rho_cut = self.dynamicPressure(lanes_j, y_cut)
+            y_new[:, j] = np.where(located, y_cut, y_new[:, j])
+            q, rho = q.copy(), rho.copy()
+            q[j], rho[j] = np.where(located, q_cut, q[j]), np.where(located, rho_cut, rho[j])
+            dt_step, overshoot, retry = dt_try.copy(), event.copy(), retry.copy()
+            dt_step[j], overshoot[j], retry[j] = np.where(located, hi * dt_j, dt_j), ~located, lo * dt_j
+        accept &= ~overshoot
+
+        # a lane rejected at min_step or max_rejections times in a row cannot meet the tolerance and is aborted
+        reject = active & ~accept
+        state['rejections'] = np.where(reject, state['rejections'] + 1, 0)
+        failed = reject & ((dt_try <= self.min_step) | (state['rejections'] >= self.max_rejections))
+        state['pruned'] = np.where(failed, self.prune_reasons.index('step size'), state['pruned'])
+        state['pruned_step'] = np.where(failed, state['count'], state['pruned_step'])
+
+        # advance the accepted lanes
+        for i, name in enumerate(self.y_names):
+            state[name] = np.where(accept, y_new[i], state[name])
+        state['m'] = np.where(accept & (dt_step >= dt_burnout), state['mcut'], state['m'])
+        state['t'] = np.where(accept, np.where(dt_step >= dt_ignition, state['t_ignition'], state['t'] + dt_step), state['t'])
+        state['count'] = state['count'] + accept
+        state['dt'] = np.where(overshoot, retry + self.event_tol / 2, np.where(active, dt_try * factor, state['dt']))
+        self.reduceStep(lanes, state, q, rho, thrust, accept)
+        self.stageEvents(lanes, state, accept)
+
+    def scalarBuffers(self):
+        # Preallocated buffers of scalarTrajectory, built on the first call and again only when the atmosphere or drag tables
+        # change: the tables as Python lists (indexing a list is cheaper than indexing an array with a scalar) and one history
+        # array of max_steps + 1 points for each of the history() columns
+        key = (self.atmosphere, self.drag_model, id(self.air_table), id(self.drag_area), self.max_steps)
+        buffers = getattr(self, 'scalar_buffers', None)
+        if buffers is None or buffers['key'] != key:
+            buffers = {'key': key, 'drag_area': self.drag_area.tolist()}
+            for name in ['rho', 'rho_slope', 'mach_scale', 'mach_scale_slope']:
+                buffers[name] = self.air_table[name].tolist()
+            for name in History.names:
+                buffers['history_' + name] = np.zeros(self.max_steps + 1)
+            self.scalar_buffers = buffers
+        return buffers
+
+    def scalarTrajectory(self, candidate, dt=1, history=False):
+        # Flies one candidate (a dict or results row of the param_names) with the Euler scheme of eulerStep in plain Python
+        # floats, for interactive what-if questions where the set-up of a batch costs more than the trajectory: no array is
+        # allocated per step, and the tables and history arrays are reused from scalarBuffers across calls. Gives the results
+        # of integrate for a lane of the same candidate in still air (a wind_profile needs integrate). Returns a dict of the
+        # results columns and the Max-Q conditions (max_q_*); with history, also 'history', a dict of views of the history
+        # buffers of every step (t, h, x, v, gamma, q, m; an analytic coast of keplerCoast is one step), overwritten by the next call
+        if self.wind_profile is not None:
+            raise ValueError('scalarTrajectory flies in still air, use integrate() with a wind_profile')
+        buffers = self.scalarBuffers()
+        lanes = self.initLanes({name: np.array([float(candidate[name])]) for name in self.param_names})
+        num_stages = self.num_stages
+        mi, mcuts, thrusts, mdots, CdSs = [lanes[name][:, 0].tolist() for name in ['mi', 'mcut', 'thrust', 'mdot', 'CdS']]
+        pitch_rate = float(lanes['pitch_kick'][0]) / self.pitch_kick_dt
+        exponential, mach = self.atmosphere == 'exponential', self.drag_model == 'mach'
+        rho_table, rho_slope, scale_table, scale_slope = buffers['rho'], buffers['rho_slope'], buffers['mach_scale'], buffers['mach_scale_slope']
+        drag_area = buffers['drag_area']
+        size = self.mach_size
+        top = len(rho_table) - 1.0
+        per_dh = 1 / self.air_table['dh']
+        mu, g0, R_earth, rho0, h0 = self.mu, self.g0, self.R_earth, self.rho0, self.h0
+        kick_low, kick_high = self.pitch_window
+        gamma_cutoff, coast_time, max_steps, max_time = self.gamma_cutoff, self.coast_time, self.max_steps, self.max_time
+        kepler, kepler_h = self.kepler_coast, self.kepler_h
+        records = [buffers['history_' + name] for name in History.names] if history else None
+        t, v, gamma, h, x, m = 0.0, 0.0, pi / 2, 0.0, 0.0, mi[0]
+        stage, burning, t_ignition, count = 0, True, 0.0, 1
+        thrust, mdot, mcut, CdS = thrusts[0], mdots[0], mcuts[0], CdSs[0]
+        max_q = max_q_t = max_q_thrust = max_q_v = max_q_m = max_q_h = max_q_gamma = max_q_rho = 0.0
+        descending = False
+        steps = 0
+        while not (gamma <= gamma_cutoff or h < 0 or count >= max_steps or t >= max_time):
+            # air and drag as in air() and dragArea()
+            g = g0 / (1 + h / R_earth)**2
+            xh = min(max(h * per_dh, 0.0), top)
+            i = int(xh)
+            f = xh - i
+            rho = rho0 * exp(-h / h0) if exponential else rho_slope[i] * f + rho_table[i]
+            q = 0.5 * rho * v**2
+            if mach:
+                j = int(min(max(v * (scale_slope[i] * f + scale_table[i]) + 0.5, 0), size - 1))
+                drag = q * drag_area[j + stage * size]
+            else:
+                drag = q * CdS
+            thrust_now = thrust if burning else 0.0
+            cos_gamma, sin_gamma = cos(gamma), sin(gamma)
+            gamma_dot = -(g / v - v / (R_earth + h)) * cos_gamma if v > 0 else 0.0
+            if burning and stage == 0 and kick_low <= h <= kick_high:
+                gamma_dot -= pitch_rate
+            v_dot = (thrust_now - drag) / m - g * sin_gamma
+            # Max-Q of the ascent as in Reducers.MaxQ
+            descending = descending or gamma < 0
+            if q > max_q and not descending:
+                max_q, max_q_t, max_q_thrust, max_q_v, max_q_m, max_q_h, max_q_gamma, max_q_rho = q, t, thrust_now, v, m, h, gamma, rho
+            if records is not None:
+                for record, value in zip(records, (t, h, x, v, gamma, q, m)):
+                    record[steps] = value
+            steps += 1
+            x += v * cos_gamma * R_earth / (R_earth + h) * dt
+            h += v * sin_gamma * dt
+            v += v_dot * dt
+            gamma += gamma_dot * dt
+            if burning:
+                m = max(m - mdot * dt, mcut)
+            t += dt
+            count += 1
+            # staging as in stageEvents
+            if burning and m <= mcut:
+                burning = False
+                if stage < num_stages - 1:
+                    stage += 1
+                    m = mi[stage]
+                    t_ignition = t + coast_time
+                    thrust, mdot, mcut, CdS = thrusts[stage], mdots[stage], mcuts[stage], CdSs[stage]
+                else:
+                    t_ignition = inf
+            if not burning and t >= t_ignition:
+                burning = True
+            if kepler and not burning and t_ignition == inf and h >= kepler_h and gamma > gamma_cutoff:
+                coast = {'h': np.array([h]), 'v': np.array([v]), 'gamma': np.array([gamma]), 'x': np.array([x]), 't': np.array([t]),
+                         'burning': np.zeros(1, dtype=bool), 't_ignition': np.array([inf]), 'count': np.array([count]), 'evaluations': np.zeros(1, dtype=int)}
+                self.keplerCoast(coast, np.ones(1, dtype=bool))
+                h, v, gamma, x, t, count = [coast[name][0].item() for name in ['h', 'v', 'gamma', 'x', 't', 'count']]
+        state = {'h': np.array([h]), 'v': np.array([v]), 'gamma': np.array([gamma]), 'pruned': np.zeros(1, dtype=int)}
+        dv_total, dv_circ, check = self.finalChecks(lanes, state)
+        result = {'count': count, 'delta_v_total': float(dv_total[0]), 'delta_v_circularization': float(dv_circ[0]), 'h': h, 'v': v, 't': t,
+                  'evaluations': count - 1, 'check': bool(check[0]), 'max_q_q': max_q, 'max_q_t': max_q_t, 'max_q_thrust': max_q_thrust,
+                  'max_q_v': max_q_v, 'max_q_m': max_q_m, 'max_q_h': max_q_h, 'max_q_gamma': max_q_gamma, 'max_q_rho': max_q_rho}
+        if records is not None:
+            for record, value in zip(records, (t, h, x, v, gamma, 0.5 * float(self.air(np.array([h]))[0][0]) * v**2, m)):
+                record[steps] = value
+            result['history'] = {name: record[:steps + 1] for name, record in zip(History.names, records)}
+        return result
+
+    def keplerCoast(self, state, active):
+        # Ends the gravity turn of the active lanes that coast above kepler_h after the burnout of their last stage in one
+        # analytic step: without thrust or drag they fly a Kepler orbit of the inverse-square gravity of air(), so the state
+        # where gamma drops to gamma_cutoff follows from vis-viva, the true anomaly of that flight path angle and Kepler's
+        # equation for the time. The downrange distance is R_earth times the change of true anomaly. Lanes on escape orbits
+        # or reaching the cutoff after max_time are left to the integrator
+        coasting = active & ~state['burning'] & np.isinf(state['t_ignition']) & (state['h'] >= self.kepler_h) & (state['gamma'] > self.gamma_cutoff)
+        if not coasting.any():
+            return
+        i = np.flatnonzero(coasting)
+        mu = self.g0 * self.R_earth**2  # gravitational parameter of the gravity of air() (m^3/s^2)
+        r, v, gamma = self.R_earth + state['h'][i], state['v'][i], state['gamma'][i]
+        energy = v**2 / 2 - mu / r  # specific orbital energy (J/kg)
+        p = (r * v * np.cos(gamma))**2 / mu  # semi-latus rectum (m)
+        e = np.sqrt(np.maximum(1 + 2 * energy * p / mu, 0))  # eccentricity
+        nu_0 = np.arctan2(v * np.sin(gamma) * np.sqrt(p / mu), p / r - 1)  # true anomaly (rad)
+        bound = (energy < 0) & (e > sin(self.gamma_cutoff))
+        e = np.where(bound, e, 0.5)
+        nu_1 = self.gamma_cutoff + pi - np.arcsin(sin(self.gamma_cutoff) / e)  # true anomaly where gamma = gamma_cutoff before apoapsis (rad)
+        r_1 = p / (1 + e * np.cos(nu_1))
+
+        def meanAnomaly(nu):
+            E = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(nu / 2), np.sqrt(1 + e) * np.cos(nu / 2))  # eccentric anomaly (rad)
+            return E - e * np.sin(E)
+
+        with np.errstate(invalid='ignore'):
+            t_1 = state['t'][i] + (meanAnomaly(nu_1) - meanAnomaly(nu_0)) * np.sqrt((-mu / (2 * energy))**3 / mu)
+        done = bound & (t_1 < self.max_time)
+        i, r_1, nu_1, nu_0, energy, t_1 = i[done], r_1[done], nu_1[done], nu_0[done], energy[done], t_1[done]
+        state['h'][i] = r_1 - self.R_earth
+        state['v'][i] = np.sqrt(2 * (energy + mu / r_1))
+        state['gamma'][i] = self.gamma_cutoff
+        state['x'][i] += self.R_earth * (nu_1 - nu_0)
+        state['t'][i] = t_1
+        state['count'][i] += 1
+        state['evaluations'][i] += 1
+
+    def integrate(self, lanes, dt=1, max_steps=None, compact_every=None, method='euler', prune=False, end='turn', incumbent=np.inf, kepler=None):
+        # Integrates all lanes until every lane has terminated and returns the final state. method is 'euler' (fixed step dt,
+        # as in the MATLAB script) or 'rk45' (adaptive step starting at dt, with located staging and pitch kick events).
+        # With compact_every, the terminated lanes are removed from the active set every compact_every steps and their final
+        # state is written into the returned arrays, so the cost of a step follows the number of live lanes.
+        # With prune, lanes are aborted as soon as pruneLanes shows they cannot be the optimal feasible trajectory; prune is
+        # True for every reason of prune_reasons or a list of the reasons to prune for. end is 'turn' (the gravity turn of the
+        # MATLAB script) or 'insertion' (cut-off of the last stage, see terminated). incumbent is the least delta-v to circularize
+        # of the feasible candidates of earlier batches, or an array of one per pitch program family for programTrade. The finished lanes of every step are passed to the reducers with their
+        # final checks; lanes['candidate'], if given, numbers them. With kepler (default kepler_coast) the drag-free coast at the end
+        # of the gravity turn is one analytic step of keplerCoast
+        if max_steps is None:
+            max_steps = self.max_steps
+        if kepler is None:
+            kepler = self.kepler_coast and end == 'turn'
+        if method == 'euler':
+            step = self.eulerStep
+        elif method == 'rk45':
+            if self.precision != 'float64':
+                raise ValueError('rk45 needs float64, its error estimates and event brackets are differences below the resolution of ' + self.precision)
+            step = self.rk45Step
+        else:
+            raise ValueError('Unknown integration method ' + str(method))
+        state = self.initState(lanes)
+        state['dt'] = np.full(state['v'].size, dt, self.precision)  # step size of each lane (s)
+        state['rejections'] = np.zeros(state['v'].size, dtype=int)  # consecutive rejected steps of each lane (rk45)
+        active = ~self.terminated(state, max_steps, end)
+        # incumbent is the least delta-v to circularize of the feasible lanes that have finished (m/s)
+        prune = self.prune_reasons[1:] if prune is True else list(prune or [])
+        if prune:
+            lanes = self.initPruning(lanes, dt)
+            if self.mission == 2 and 'inclination' in prune:
+                fails = active & ~self.inclinationCheck(lanes)
+                state['pruned'][fails] = self.prune_reasons.index('inclination')
+                state['pruned_step'][fails] = state['count'][fails]
+                active &= ~fails
+
+        def advance(lanes, state, active):
+            # One step of the active lanes; returns the lanes still active
+            nonlocal incumbent
+            step(lanes, state, active, dt)
+            if kepler:
+                self.keplerCoast(state, active)
+            finished = active & self.terminated(state, max_steps, end)
+            active = active & ~finished
+            if finished.any() and (prune or len(self.reducers) > 1):
+                done = np.flatnonzero(finished)
+                done_state = compactLanes(state, done)
+                dv_total, dv_circ, check = self.finalChecks(compactLanes(lanes, done), done_state)
+                group = self.incumbentGroup(lanes)
+                incumbent = self.updateIncumbent(incumbent, group[done] if group is not None else None, dv_circ, check)
+                final = {'candidate': lanes['candidate'][done] if 'candidate' in lanes else done}
+                for name in ['count', 'h', 'v', 't']:
+                    final[name] = done_state[name]
+                final.update({'delta_v_total': dv_total, 'delta_v_circularization': dv_circ, 'check': check})
+                for reducer in self.reducers:
+                    reducer.finished(self, final)
+            if prune:
+                active &= ~self.pruneLanes(lanes, state, active, incumbent, prune)
+            return active
+
+        if compact_every is None:
+            while active.any():
+                active = advance(lanes, state, active)
+            return state
+
+        live_index = np.flatnonzero(active)  # lane numbers of the live lanes
+        live_lanes = compactLanes(lanes, live_index)
+        live = compactLanes(state, live_index)
+        active = active[live_index]
+        steps = 0
+        while live_index.size > 0:
+            active = advance(live_lanes, live, active)
+            steps += 1
+            if steps % compact_every == 0 or not active.any():
+                done = ~active
+                for name in state:
+                    state[name][live_index[done]] = live[name][done]
+                live_index = live_index[active]
+                live_lanes = compactLanes(live_lanes, active)
+                live = compactLanes(live, active)
+                active = active[active]
+        return state
+
+    def finalChecks(self, lanes, state):
+        # Hohmann transfer and feasibility checks of 'Trajectory_TL_0407.m' for every lane; returns delta-v total, delta-v to circularize and check
+        idx = np.arange(state['v'].size)
+        h, v = state['h'], state['v']
+        r_p = h + self.R_earth  # periapsis radius (m)
+        r_a = self.rf  # apoapsis radius (m)
+        v_circ = np.sqrt(self.mu / r_p)
+        dv_circ = v_circ - (v + self.siteVelocity(lanes))
+        dv_1 = v_circ * (np.sqrt(2 * r_a / (r_p + r_a)) - 1)
+        dv_2 = np.sqrt(self.mu / r_a) * (1 - np.sqrt(2 * r_p / (r_p + r_a)))
+        dv_total = dv_1 + dv_2 + dv_circ
+
+        # the last stage must hold enough propellant for the transfer
+        top = lanes['num_stages'] - 1
+        Isp_top, mf_top, mcut_top = lanes['Isp'][top, idx], lanes['mf'][top, idx], lanes['mcut'][top, idx]
+        with np.errstate(over='ignore'):
+            MR_H_transfer = np.exp(dv_total / (self.g0 * Isp_top))
+        check = MR_H_transfer <= mcut_top / mf_top
+        check &= (h < self.h_max) & (h >= 0)
+        check &= state['gamma'] <= self.gamma_cutoff
+        check &= (dv_total > 0) & (dv_circ > 0)
+        check &= dv_circ < self.dv_circ_max
+        if self.mission == 2:
+            check &= self.inclinationCheck(lanes)
+        check &= state['pruned'] == 0
+        return dv_total, dv_circ, check
+
+    def inclinationCheck(self, lanes):
+        # Mission 2: the propellant left in the last stage must cover the 10 deg inclination change at the final orbit
+        top = lanes['num_stages'] - 1
+        idx = np.arange(top.size)
+        dv_check = self.g0 * lanes['Isp'][top, idx] * np.log(lanes['mcut'][top, idx] / lanes['mf'][top, idx])
+        return dv_check > self.dv_inc_change
+
+    def initPruning(self, lanes, dt):
+        # Adds to the lanes the largest delta-v the stages above each stage can still give (dv_after) and the largest delta-v of
+        # each stage beyond its rocket-equation delta-v, one step of thrust at the cut-off mass since an Euler step that reaches
+        # mcut still applies thrust for the whole step (dv_margin)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dv_stage = np.where(lanes['mcut'] > 0, self.g0 * lanes['Isp'] * np.log(lanes['mi'] / lanes['mcut']), 0)
+            dv_margin = np.where(lanes['mcut'] > 0, dt * lanes['thrust'] / lanes['mcut'], 0)
+        stages = np.arange(3)[:, None]
+        dv_stage = np.where(stages < lanes['num_stages'], dv_stage + dv_margin, 0)
+        lanes = dict(lanes)
+        lanes['dv_after'] = np.cumsum(dv_stage[::-1], axis=0)[::-1] - dv_stage
+        lanes['dv_margin'] = dv_margin
+        return lanes
+
+    def siteVelocity(self, lanes):
+        # Velocity of the launch site gained by every lane (m/s), negative for retrograde inclinations: lanes['v_ls'] if the
+        # candidates carry one (the launch sites of siteTrade), else the launch site of the trajectory
+        if 'v_ls' in lanes:
+            return lanes['v_ls']
+        return self.v_ls if self.inc < 90 else -self.v_ls
+
+    def dvCircMin(self, v_max, lanes):
+        # Lower bound of the delta-v to circularize of the feasible lanes whose velocity at the end of the gravity turn is at most v_max
+        return np.sqrt(self.mu / (self.R_earth + self.h_max)) - (v_max + self.siteVelocity(lanes))
+
+    def preScreen(self, candidates, dt=1, losses=None):
+        # Rocket-equation bounds of every candidate before any time step: the ideal delta-v of the stack with its mleft, the burn
+        # time of its stages and separation coasts, and the delta-v the last stage holds after cut-off. A candidate is screened
+        # out when the ideal delta-v less losses cannot reach a delta-v to circularize below the limit ('velocity'), when the last
+        # stage cannot hold the Hohmann transfer from h_max, the cheapest transfer of a feasible lane ('transfer'), or, for
+        # mission 2, the inclination change ('inclination'). losses (m/s, default screen_losses) is subtracted from the ideal
+        # delta-v; only 0 keeps the screen exact, see missionLosses. Returns a DataFrame with the reason of every candidate
+        if losses is None:
+            losses = self.screen_losses
+        lanes = self.initPruning(self.initLanes(candidates), dt)
+        n = lanes['pitch_kick'].size
+        idx = np.arange(n)
+        top = lanes['num_stages'] - 1
+        stages = np.arange(3)[:, None] < lanes['num_stages']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dv_stage = np.where(stages, self.g0 * lanes['Isp'] * np.log(lanes['mi'] / lanes['mcut']), 0)
+            burn_time = np.where(stages, (lanes['mi'] - lanes['mcut']) / lanes['mdot'], 0)
+        dv_ideal = lanes['dv_after'][0] + dv_stage[0] + lanes['dv_margin'][0]
+        dv_top = self.g0 * lanes['Isp'][top, idx] * np.log(lanes['mcut'][top, idx] / lanes['mf'][top, idx])
+        r_p, r_a = self.R_earth + self.h_max, self.rf
+        dv_hohmann = np.sqrt(self.mu / r_p) * (np.sqrt(2 * r_a / (r_p + r_a)) - 1) + np.sqrt(self.mu / r_a) * (1 - np.sqrt(2 * r_p / (r_p + r_a)))
+        reasons = [(self.dvCircMin(dv_ideal - losses, lanes) >= self.dv_circ_max, 'velocity'), (dv_top < dv_hohmann, 'transfer')]
+        if self.mission == 2:
+            reasons.append((~self.inclinationCheck(lanes), 'inclination'))
+        screened = np.full(n, '', dtype=object)
+        for fails, reason in reasons:
+            screened = np.where((screened == '') & fails, reason, screened)
+        screen = pd.DataFrame({name: candidates[name] for name in self.param_names})
+        screen['delta_v_ideal'] = dv_ideal
+        screen['burn_time'] = burn_time.sum(axis=0) + self.coast_time * (lanes['num_stages'] - 1)
+        screen['delta_v_top'] = dv_top
+        screen['screened'] = screened
+        return screen
+
+    def screenReport(self):
+        # Number and fraction of the candidates of the last sweep or refine removed by preScreen for each reason
+        if self.screen is None:
+            return pd.DataFrame(columns=['candidates', 'fraction'])
+        report = self.screen[self.screen['screened'] != '']['screened'].value_counts().to_frame('candidates')
+        report['fraction'] = report['candidates'] / self.num_candidates
+        return report
+
+    def incumbentGroup(self, lanes):
+        # Group of every lane that keeps its own incumbent, since the groups do not compete: the pitch program family of the
+        # lanes of programTrade; None if all lanes compete
+        return np.asarray(lanes['program']) if 'program' in lanes else None
+
+    def incumbentSize(self, candidates):
+        # Number of incumbents of a sweep of candidates (see incumbentGroup), 0 for a single one
+        return len(self.pitch_programs) if 'program' in candidates else 0
+
+    def updateIncumbent(self, incumbent, group, dv_circ, check):
+        # Least delta-v to circularize of the incumbent and the feasible lanes given by check. programTrade keeps one
+        # incumbent per program family (an array), updated from the lanes of each family (see incumbentGroup)
+        if np.ndim(incumbent) == 0:
+            return min(incumbent, np.min(dv_circ[check], initial=np.inf))
+        incumbent = incumbent.copy()
+        np.minimum.at(incumbent, group[check], dv_circ[check])
+        return incumbent
+
+    def pruneLanes(self, lanes, state, active, incumbent, reasons=None):
+        # Aborts the active lanes that provably fail a check of finalChecks or cannot beat the incumbent, the least delta-v to
+        # circularize of the feasible lanes that have finished. While gamma > 0 the altitude only rises, so a lane above h_max
+        # fails. Drag and gravity only slow the vehicle, so its final velocity is at most its velocity plus the rocket-equation
+        # delta-v left in its stages, which bounds the delta-v to circularize from below at the circular velocity of h_max.
+        # Only the prune_reasons in reasons (default all) are pruned for, and 'dominated' only while self.objective is the delta-v
+        # to circularize, the only objective the bound holds for. Returns the lanes pruned by this call
+        idx = np.arange(state['v'].size)
+        stage = state['stage']
+        to_burn = state['burning'] | np.isfinite(state['t_ignition'])  # the current stage is burning or waits for ignition
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dv_left = np.where(to_burn, self.g0 * lanes['Isp'][stage, idx] * np.log(state['m'] / state['mcut'])
+                               + lanes['dv_margin'][stage, idx], 0) + lanes['dv_after'][stage, idx]
+        dv_circ_min = self.dvCircMin(state['v'] + dv_left, lanes)
+        if np.ndim(incumbent) > 0:
+            incumbent = incumbent[self.incumbentGroup(lanes)]
+        if reasons is None:
+            reasons = self.prune_reasons[1:]
+        if self.objective != 'delta_v_circularization':
+            reasons = [reason for reason in reasons if reason != 'dominated']
+        checks = [(state['h'] >= self.h_max, 'altitude'), (dv_circ_min >= self.dv_circ_max, 'circularization'),
+                  (dv_circ_min > incumbent, 'dominated')]
+        pruned = np.zeros(idx.size, dtype=bool)
+        for fails, reason in checks:
+            if reason not in reasons:
+                continue
+            code = self.prune_reasons.index(reason)
+            new = active & ~pruned & fails
+            state['pruned'] = np.where(new, code, state['pruned'])
+            pruned |= new
+        state['pruned_step'] = np.where(pruned, state['count'], state['pruned_step'])
+        return pruned
+
+    def evaluate(self, lanes, state, candidates):
+        # Returns the checks of every lane as a DataFrame in the MATLAB 'Results' layout
+        dv_total, dv_circ, check = self.finalChecks(lanes, state)
+        record = pd.DataFrame({name: candidates[name] for name in self.param_names})
+        record['count'] = state['count']
+        record['delta_v_total'] = dv_total
+        record['delta_v_circularization'] = dv_circ
+        record['h'] = state['h']
+        record['v'] = state['v']
+        record['t'] = state['t']
+        record['evaluations'] = state['evaluations']
+        record['pruned'] = np.array(self.prune_reasons)[state['pruned']]
+        record['pruned_step'] = state['pruned_step']
+        record['check'] = check
+        return record
+
+    def insertionTable(self, state):
+        # Returns the state of every lane at insertion, the cut-off of the last stage, or its final state if it ended first
+        reached = ~np.isnan(state['insertion_t'])
+        return pd.DataFrame({name: np.where(reached, state['insertion_' + name], state[name]) for name in self.insertion_names}).assign(cut_off=reached)
+
+    def maxQTable(self, lanes, state):
+        # Returns the Max-Q conditions of every lane in the layout of 'LVMasses/Max Q Conditions_<name>.csv'
+        return pd.DataFrame({
+            'Time (s)': state['max_q_t'],
+            'Thrust (N)': state['max_q_thrust'],
+            'Max-q (Pa)': state['max_q_q'],
+            'Velocity (m/s)': state['max_q_v'],
+            'Mass Burned (kg)': lanes['mi'][0] - state['max_q_m'],
+            'Height (m)': state['max_q_h'],
+            'Gamma (rad)': state['max_q_gamma'],
+            'Air Density (kg/m^3)': state['max_q_rho'],
+            'Angle of Attack (rad)': state['max_q_alpha'],
+            'Wind Speed (m/s)': state['max_q_wind'],
+            'q-alpha (Pa rad)': state['max_q_q'] * state['max_q_alpha'],
+        })
+
+    def sweep(self, grid=None, dt=1, compact_every=20, method='euler', prune=True, screen=True, reducers=None, chunk_size=None, store=None, cache=False):
+        # Runs every candidate of the grid as one batch. Sets self.record (integrated candidates, indexed by grid position),
+        # self.results (feasible candidates) and self.max_q (Max-Q conditions of the integrated candidates) and returns
+        # self.results. With screen, preScreen removes the candidates that cannot reach orbit before the integration (see
+        # screenReport). With prune, the candidates that
+        # cannot be the optimal trajectory are aborted during the integration (see pruneReport) and are not in self.results.
+        # reducers are Reducers run on every integrated candidate besides Max-Q, e.g. Reducers.TopK; their results are set in
+        # self.reductions by class name, and reducers with keep_dominated turn off the 'dominated' pruning. The candidates are integrated in batches of chunk_size (default
+        # self.chunk_size), so the memory of the integration does not grow with the size of the grid. With store (a directory or
+        # a ResultStore), the results and Max-Q conditions of every batch are also appended to a memory-mapped ResultStore.
+        # With cache, the results are reused from cache_dir if a sweep of the same inputs was run before (see cacheKey);
+        # sweeps with reducers or a store always run. A sweep in reduced precision (setPrecision) ends with verifyPrecision
+        cache = cache and not reducers and store is None
+        if cache:
+            key = self.cacheKey(grid, dt=dt, compact_every=compact_every, method=method, prune=prune, screen=screen,
+                                chunk_size=chunk_size)
+            if self.loadCache(key):
+                return self.results
+        candidates = self.gridCandidates(grid)
+        self.num_candidates = len(candidates['pitch_kick'])
+        if isinstance(store, str):
+            store = ResultStore.create(store, {name: (self.grid if grid is None else grid)[name] for name in self.param_names})
+        reducers = list(reducers or [])
+        if prune and any(reducer.keep_dominated for reducer in reducers):
+            prune = [reason for reason in (self.prune_reasons[1:] if prune is True else prune) if reason != 'dominated']
+        for reducer in reducers:
+            reducer.start(self)
+        self.reducers = self.reducers[:1] + reducers
+        try:
+            self.record, self.max_q, self.screen = self.runCandidates(candidates, dt, compact_every, method, prune, screen, chunk_size, store)
+        finally:
+            self.reducers = self.reducers[:1]
+        self.reductions = {type(reducer).__name__: reducer.result() for reducer in reducers}
+        self.results = self.record[self.record['check']]
+        self.precision_report = self.verifyPrecision(dt=dt, method=method) if self.precision != 'float64' else None
+        if cache:
+            self.saveCache(key)
+        return self.results
+
+    def verifyPrecision(self, top_k=None, dt=1, method='euler'):
+        # Flies the top_k (default verify_top_k) feasible candidates of a reduced precision sweep again in float64 and returns
+        # their objective, Max-Q, altitude and time at the end of the gravity turn in both precisions with the difference, their
+        # rank in each precision and their float64 feasibility. Sets self.ranking_changed if the float64 ranking differs or a
+        # candidate is infeasible in float64; candidates outside the top_k are not verified
+        top_k = self.verify_top_k if top_k is None else top_k
+        top = self.results.sort_values(self.objective).iloc[:top_k]
+        precision = self.precision
+        self.setPrecision('float64')
+        try:
+            record, max_q = self.runCandidates({name: top[name].to_numpy(dtype=float) for name in self.param_names}, dt, method=method,
+                                               prune=False, screen=False)[:2]
+        finally:
+            self.setPrecision(precision)
+        feasible = record['check'].to_numpy()
+        report = pd.DataFrame(index=top.index)
+        report['rank ' + precision] = np.arange(1, len(top) + 1)
+        report['rank float64'] = pd.Series(np.where(feasible, record[self.objective], np.nan)).rank(method='first').to_numpy()
+        for name, reduced, full in [(self.objective, top[self.objective], record[self.objective]), ('Max-q (Pa)', self.max_q.loc[top.index, 'Max-q (Pa)'], max_q['Max-q (Pa)']),
+                                    ('h', top['h'], record['h']), ('t', top['t'], record['t'])]:
+            report[name + ' ' + precision] = reduced.to_numpy(dtype=float)
+            report[name + ' float64'] = full.to_numpy(dtype=float)
+            report[name + ' difference'] = report[name + ' float64'] - report[name + ' ' + precision]
+        report['feasible float64'] = feasible
+        self.ranking_changed = bool(not feasible.all() or (report['rank float64'] != report['rank ' + precision]).any())
+        return report
+
+    def cacheKey(self, grid=None, **settings):
+        # SHA-256 of everything a sweep depends on: the step vectors, mission, launch latitude, grid, Cd(Mach) tables, every
+        # setting of the class (constants, integrator and pruning parameters, atmosphere and drag models, cache_version, ...)
+        # and the settings of the sweep call
+        model = {name: getattr(self, name) for name in dir(type(self)) if not name.startswith('_') and not callable(getattr(self, name))}
+        inputs = {'steps': self.steps, 'mission': self.mission, 'launch_latitude': self.launch_latitude, 'cd_tables': self.cd_tables,
+                  'grid': {name: (self.grid if grid is None else grid)[name] for name in self.param_names}, 'model': model, 'settings': settings}
+        text = json.dumps(inputs, sort_keys=True, default=lambda value: vars(value) if hasattr(value, '__dict__') else np.asarray(value).tolist())
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def loadCache(self, key):
+        # Sets the results of a cached sweep; returns False if there is none
+        path = os.path.join(self.cache_dir, key + '.pkl')
+        if not os.path.exists(path):
+            return False
+        cached = pd.read_pickle(path)
+        self.num_candidates, self.record, self.max_q, self.screen = cached['num_candidates'], cached['record'], cached['max_q'], cached['screen']
+        self.precision_report = cached.get('precision_report')
+        self.ranking_changed = cached.get('ranking_changed', False)
+        self.reductions = {}
+        self.results = self.record[self.record['check']]
+        return True
+
+    def saveCache(self, key):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, key + '.pkl')
+        pd.to_pickle({'num_candidates': self.num_candidates, 'record': self.record, 'max_q': self.max_q, 'screen': self.screen,
+                      'precision_report': self.precision_report, 'ranking_changed': self.ranking_changed}, path + '.tmp')
+        os.replace(path + '.tmp', path)  # a sweep stopped while writing leaves no partial cache entry
+
+    def runCandidates(self, candidates, dt=1, compact_every=20, method='euler', prune=True, screen=True, chunk_size=None, store=None):
+        # Integrates a dict of candidate arrays in batches of chunk_size (default self.chunk_size). Returns the results and Max-Q
+        # conditions of the integrated candidates, indexed by their position in candidates, and the preScreen of all candidates
+        # (None without screen). The incumbent of the pruning is carried from one batch to the next. Every batch is appended to
+        # store, a ResultStore, if given
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        keep = np.arange(len(candidates['pitch_kick']))
+        screened = None
+        if screen:
+            screened = self.preScreen(candidates, dt)
+            keep = np.flatnonzero(screened['screened'].to_numpy() == '')
+        records, max_qs = [], []
+        incumbent = np.full(self.incumbentSize(candidates), np.inf) if self.incumbentSize(candidates) else np.inf
+        for start in range(0, max(keep.size, 1), chunk_size):
+            chunk = keep[start:start + chunk_size]
+            batch = {name: np.asarray(value)[chunk] for name, value in candidates.items()}
+            lanes = self.initLanes(batch)
+            lanes['candidate'] = chunk
+            state = self.integrate(lanes, dt, compact_every=compact_every, method=method, prune=prune, incumbent=incumbent)
+            record = self.evaluate(lanes, state, batch)
+            max_q = self.maxQTable(lanes, state)
+            record.index = max_q.index = chunk
+            for reducer in self.reducers[1:]:
+                reducer.collect(self, lanes, state, chunk)
+            if store is not None:
+                store.append(record.join(max_q))
+            incumbent = self.updateIncumbent(incumbent, self.incumbentGroup(batch), record['delta_v_circularization'].to_numpy(), record['check'].to_numpy())
+            records.append(record)
+            max_qs.append(max_q)
+        return pd.concat(records), pd.concat(max_qs), screened
+
+    def violation(self, record):
+        # Relative distance of each candidate from the feasibility checks on the end of the gravity turn (0 if it passes them),
+        # used to rank infeasible candidates in refine
+        h, dv_circ = record['h'].to_numpy(), record['delta_v_circularization'].to_numpy()
+        violation = np.maximum(h - self.h_max, 0) / self.h_max + (h < 0) * (1 - h / self.h_max)
+        violation += np.maximum(-dv_circ, 0) / 1000
+        if np.isfinite(self.dv_circ_max):
+            violation += np.maximum(dv_circ - self.dv_circ_max, 0) / self.dv_circ_max
+        violation += (record['count'].to_numpy() >= self.max_steps) | (record['t'].to_numpy() >= self.max_time)  # gamma cutoff never reached
+        return violation
+
+    def refine(self, top_k=10, resolution=None, dt=1, compact_every=20, method='euler'):
+        # Coarse-to-fine search of the sweep grid. Every axis of self.grid becomes a lattice of spacing resolution[axis] (by
+        # default the grid spacing) over the grid range. Along a pitch kick line (all other parameters fixed) the altitude at the
+        # end of the gravity turn drops below h_max once and stays below, and the feasible trajectories are the first lattice
+        # points below it, so each line is searched by bisection for that point (searchLines). The other axes start on a coarse
+        # sub-lattice with about three points per axis; the top_k lines by the selection criterion (least self.objective of the
+        # feasible ones, then least violation of the infeasible ones) are kept and their lattice neighbours at half the spacing
+        # are searched, until the spacing of every axis is its resolution and the top_k stop changing.
+        # Sets self.record, self.results, self.max_q and self.screen like sweep over every evaluated candidate, and
+        # self.refine_report, and returns self.results
+        if resolution is None:
+            resolution = {}
+        axes = [name for name in self.param_names if len(self.grid[name]) > 1]
+        low = np.array([np.min(self.grid[name]) for name in axes])
+        high = np.array([np.max(self.grid[name]) for name in axes])
+        res = np.array([resolution.get(name, np.diff(np.sort(self.grid[name])).min()) for name in axes])
+        last = np.round((high - low) / res).astype(int)  # largest lattice index of each axis
+        kick = axes.index('pitch_kick')
+        vehicle = [i for i in range(len(axes)) if i != kick]  # lattice axes other than the pitch kick
+        stride = 2**np.floor(np.log2(np.maximum(last[vehicle] / 2, 1))).astype(int)  # coarse spacing in lattice steps
+        records, max_qs, screens, report = [], [], [], []
+        positions = {}  # record position of every evaluated lattice point
+
+        def toCandidates(points):
+            candidates = {name: np.full(len(points), float(self.grid[name][0])) for name in self.param_names}
+            for i, name in enumerate(axes):
+                candidates[name] = np.round(low[i] + points[:, i] * res[i], 12)
+            return candidates
+
+        def run(points):
+            # Integrates the lattice points that have not been evaluated and returns the record positions of all points.
+            # Lanes above h_max are pruned, which keeps their side of the h_max crossing
+            new = np.array([point for point in dict.fromkeys(map(tuple, points)) if point not in positions], dtype=int).reshape(-1, len(axes))
+            if len(new) > 0:
+                record, max_q = self.runCandidates(toCandidates(new), dt, compact_every, method, ['altitude'], False)[:2]
+                offset = sum(len(r) for r in records)
+                record.index = max_q.index = record.index + offset
+                records.append(record.assign(violation=self.violation(record)))
+                max_qs.append(max_q)
+                positions.update({tuple(point): offset + i for i, point in enumerate(new)})
+            return np.array([positions[tuple(point)] for point in points], dtype=int)
+
+        def searchLines(lines):
+            # Bisects every pitch kick line for its first lattice point below h_max and evaluates it and the next point.
+            # Returns the record position of the best point of each line
+            line = lambda k: np.insert(lines, kick, k, axis=1)
+
+            def below(points):
+                evaluated = run(points)
+                return pd.concat(records).loc[evaluated, 'h'].to_numpy() < self.h_max
+
+            lo, hi = np.zeros(len(lines), dtype=int), np.full(len(lines), last[kick])
+            run(np.concatenate([line(lo), line(hi)]))
+            below_lo, below_hi = below(line(lo)), below(line(hi))
+            searching = ~below_lo & below_hi
+            while (searching & (hi - lo > 1)).any():
+                mid = (lo + hi) // 2
+                split = searching & (hi - lo > 1)
+                below_mid = np.zeros(len(lines), dtype=bool)
+                below_mid[split] = below(line(mid)[split])
+                hi = np.where(split & below_mid, mid, hi)
+                lo = np.where(split & ~below_mid, mid, lo)
+            first = np.where(below_lo, 0, hi)  # first point below h_max, or the last point if the whole line is above
+            candidates = np.stack([run(line(first)), run(line(np.minimum(first + 1, last[kick])))], axis=1)
+            ranked = pd.concat(records).loc[candidates.ravel()].reset_index()
+            ranked['line'] = np.repeat(np.arange(len(lines)), 2)
+            ranked = ranked.sort_values(['check', 'violation', self.objective], ascending=[False, True, True])
+            return ranked.drop_duplicates('line').sort_values('line')['index'].to_numpy()
+
+        coarse = np.meshgrid(*[np.unique(np.append(np.arange(0, n + 1, s), n)) for n, s in zip(last[vehicle], stride)], indexing='ij')
+        lines = np.stack([axis.ravel() for axis in coarse], axis=1)
+        searched = np.empty((0, len(vehicle)), dtype=int)  # vehicle lattice points of the searched lines
+        best = np.empty(0, dtype=int)  # record position of the best point of each searched line
+        top = None
+        level = 0
+        while len(lines) > 0:
+            evaluated = sum(len(r) for r in records)
+            evaluations = sum(r['evaluations'].sum() for r in records)
+            # the screen does not depend on the pitch kick, so it removes whole lines
+            kicks = np.arange(last[kick] + 1)
+            points = np.insert(np.repeat(lines, kicks.size, axis=0), kick, np.tile(kicks, len(lines)), axis=1)
+            screened = self.preScreen(toCandidates(points), dt)
+            screens.append(screened)
+            keep = screened['screened'].to_numpy().reshape(len(lines), kicks.size)[:, 0] == ''
+            searched = np.concatenate([searched, lines])
+            best = np.concatenate([best, np.full(len(lines), -1)])
+            if keep.any():
+                best[len(best) - len(lines):][keep] = searchLines(lines[keep])
+            table = pd.concat(records) if records else None
+            ranked = [i for i in table.loc[best[best >= 0]].sort_values(['check', 'violation', self.objective],
+                                                                        ascending=[False, True, True]).index] if table is not None else []
+            line_of = {position: i for i, position in enumerate(best) if position >= 0}
+            new_top = []
+            for position in ranked:
+                # a line inside the neighbourhood of a better one is not a new neighbourhood
+                i = line_of[position]
+                if not any(np.all(np.abs(searched[i] - searched[j]) <= stride) for j in new_top):
+                    new_top.append(i)
+                if len(new_top) == top_k:
+                    break
+            report.append({'level': level, 'stride': tuple(stride), 'lines': len(lines), 'screened lines': int(np.sum(~keep)),
+                           'candidates': sum(len(r) for r in records) - evaluated,
+                           'evaluations': sum(r['evaluations'].sum() for r in records) - evaluations,
+                           'feasible': int(table['check'].sum()) if table is not None else 0,
+                           'best ' + self.objective: table.loc[table['check'], self.objective].min() if table is not None else np.nan})
+            if (stride == 1).all() and top is not None and set(new_top) == set(top):
+                break
+            top = new_top
+            stride = np.maximum(stride // 2, 1)
+            # lattice neighbours of the top lines, one spacing away along any combination of axes
+            offsets = np.stack([axis.ravel() for axis in np.meshgrid(*[[-1, 0, 1]] * len(vehicle), indexing='ij')], axis=1) * stride
+            neighbours = (searched[np.asarray(top, dtype=int)][:, None, :] + offsets[None, :, :]).reshape(-1, len(vehicle))
+            neighbours = np.unique(np.clip(neighbours, 0, last[vehicle]), axis=0)
+            seen = {tuple(point) for point in searched}
+            lines = np.array([point for point in neighbours if tuple(point) not in seen], dtype=int).reshape(-1, len(vehicle))
+            level += 1
+        if not records:
+            raise ValueError('Every candidate of ' + self.name + ' was screened out')
+        self.record = pd.concat(records).drop(columns='violation')
+        self.max_q = pd.concat(max_qs)
+        self.screen = pd.concat(screens, ignore_index=True)
+        self.num_candidates = len(self.record) + int(np.sum(self.screen['screened'] != ''))
+        self.results = self.record[self.record['check']]
+        self.refine_report = pd.DataFrame(report).set_index('level')
+        return self.results
+
+    def optimize(self, starts=8, objective='t', sample=1000, max_iterations=200, xtol=1e-3, dt=1, method='euler', seed=0):
+        # Bounded Nelder-Mead search of the continuous space of the grid axes (thrust scale factors, pitch kick and mleft, within
+        # the grid ranges) instead of the grid, minimizing objective (by default the time to the end of the gravity turn) subject to
+        # the checks of finalChecks. The starts best points of a random sample of the space are the starting points and all
+        # simplexes advance together: the reflection, expansion and both contractions of every simplex are flown as one batch
+        # of lanes per iteration. Infeasible points cost more than any feasible one, by their violation of the checks. A start
+        # stops once its simplex spans less than xtol of the range of every axis; the time of a fixed step is a staircase of dt,
+        # so a finer xtol only adds iterations. An iteration flies a few dozen lanes, so the search is bound by the cost of a
+        # step, not by the number of lanes, and takes longer than a sweep of the whole grid
+        # Sets self.record, self.results and self.max_q over every evaluated point and self.optimize_report (the best vertex of
+        # each start), and returns the feasible row with the least objective in the MATLAB 'Results' layout. self.objective,
+        # which selects the optimal trajectory of print() and writeMaxQConditions(), is not changed
+        axes = [name for name in self.param_names if len(self.grid[name]) > 1]
+        low = np.array([np.min(self.grid[name]) for name in axes])
+        high = np.array([np.max(self.grid[name]) for name in axes])
+        records, max_qs = [], []
+
+        def cost(x):
+            # Penalized objective of the points x of the unit cube (one row per point)
+            candidates = {name: np.full(len(x), float(self.grid[name][0])) for name in self.param_names}
+            for i, name in enumerate(axes):
+                candidates[name] = low[i] + x[:, i] * (high[i] - low[i])
+            record, max_q = self.runCandidates(candidates, dt, 20, method, False, False)[:2]
+            offset = sum(len(r) for r in records)
+            record.index = max_q.index = record.index + offset
+            records.append(record)
+            max_qs.append(max_q)
+            return self.penalty(record, candidates, objective)
+
+        def clip(x):
+            return np.clip(x, 0, 1)
+
+        n, d = starts, len(axes)
+        x = np.random.default_rng(seed).random((sample, d))
+        f = cost(x)
+        first = np.argsort(f)[:n]
+        simplex = np.repeat(x[first][:, None, :], d + 1, axis=1)  # vertices of each start, shape (starts, d + 1, d)
+        step = np.where(x[first] + 0.1 <= 1, 0.1, -0.1)
+        for i in range(d):
+            simplex[:, i + 1, i] += step[:, i]
+        values = np.empty((n, d + 1))
+        values[:, 0] = f[first]
+        values[:, 1:] = cost(simplex[:, 1:].reshape(-1, d)).reshape(n, d)
+        iterations = np.zeros(n, dtype=int)
+        for iteration in range(max_iterations):
+            order = np.argsort(values, axis=1)
+            simplex = np.take_along_axis(simplex, order[:, :, None], axis=1)
+            values = np.take_along_axis(values, order, axis=1)
+            live = np.abs(simplex - simplex[:, :1]).max(axis=(1, 2)) >= xtol
+            if not live.any():
+                break
+            iterations += live
+            centroid = simplex[:, :-1].mean(axis=1)
+            worst = simplex[:, -1]
+            x_r = clip(2 * centroid - worst)  # reflection
+            trials = np.stack([x_r, clip(3 * centroid - 2 * worst), (centroid + x_r) / 2, (centroid + worst) / 2])  # and expansion, contractions
+            f_trials = np.full((4, n), np.inf)
+            f_trials[:, live] = cost(trials[:, live].reshape(-1, d)).reshape(4, -1)
+            f_r = f_trials[0]
+            expand = live & (f_r < values[:, 0])
+            outside = live & (f_r >= values[:, -2]) & (f_r < values[:, -1])
+            inside = live & (f_r >= values[:, -1])
+            x_2 = np.where(expand[:, None], trials[1], np.where(outside[:, None], trials[2], trials[3]))
+            f_2 = np.where(expand, f_trials[1], np.where(outside, f_trials[2], f_trials[3]))
+            take_r = live & ~inside & ~outside & ~(expand & (f_2 < f_r))
+            take_2 = (expand & (f_2 < f_r)) | (outside & (f_2 <= f_r)) | (inside & (f_2 < values[:, -1]))
+            simplex[:, -1] = np.where(take_r[:, None], x_r, np.where(take_2[:, None], x_2, simplex[:, -1]))
+            values[:, -1] = np.where(take_r, f_r, np.where(take_2, f_2, values[:, -1]))
+            shrink = (outside | inside) & ~take_2
+            if shrink.any():
+                simplex[shrink, 1:] = (simplex[shrink, :1] + simplex[shrink, 1:]) / 2
+                values[shrink, 1:] = cost(simplex[shrink, 1:].reshape(-1, d)).reshape(-1, d)
+        self.record = pd.concat(records)
+        self.max_q = pd.concat(max_qs)
+        self.screen = None
+        self.num_candidates = len(self.record)
+        self.results = self.record[self.record['check']]
+        best = np.argmin(values, axis=1)
+        self.optimize_report = pd.DataFrame(low + simplex[np.arange(n), best] * (high - low), columns=axes)
+        self.optimize_report['cost'] = values[np.arange(n), best]
+        self.optimize_report['iterations'] = iterations
+        if len(self.results) == 0:
+            raise ValueError('No feasible trajectory was found for ' + self.name)
+        return self.results.loc[self.results[objective].idxmin()]
+
+    def penalty(self, record, candidates, objective=None):
+        # Cost of the optimizer: objective (default self.objective) of the feasible candidates. An infeasible candidate costs more
+        # than any feasible one, infeasible_cost, plus infeasible_cost times its violation of the checks
+        objective = self.objective if objective is None else objective
+        violation = self.violation(record)
+        screen = self.preScreen(candidates)
+        dv_top, dv_total = screen['delta_v_top'].to_numpy(), record['delta_v_total'].to_numpy()
+        violation += np.maximum(dv_total - dv_top, 0) / 1000 + np.maximum(-dv_total, 0) / 1000  # transfer
+        if self.mission == 2:
+            violation += np.maximum(self.dv_inc_change - dv_top, 0) / 1000
+        check = record['check'].to_numpy()
+        return np.where(check, record[objective].to_numpy(), self.infeasible_cost * (1 + violation))
+
+    def target(self, free, h_target, gamma_target=0, candidates=None, bounds=None, h_tol=100, gamma_tol=radians(0.05), max_iterations=10,
+               scan=5, dt=1, method='euler'):
+        # Solves for one or two free parameters (names of param_names, e.g. 'scale_factor_2' or ['scale_factor_2', 'pitch_kick'])
+        # that put insertion, the cut-off of the last stage, at the altitude h_target (m) and, with two free parameters, the
+        # flight path angle gamma_target (rad). The trajectories run to insertion rather than to the gamma cutoff. candidates
+        # (a dict of arrays or a results row, by default the middle of the grid) gives the other parameters; each of its
+        # candidates is a targeting problem and all problems are solved at once as lanes of the same batches. bounds maps a free
+        # parameter to its (low, high) range, by default the grid range.
+        # One free parameter: the range is scanned at scan points for a bracket of the altitude, which bracketed secant
+        # (Illinois) iterations close. Two free parameters: Newton iterations from the starting values, with a finite-difference
+        # Jacobian and the step limited to a quarter of the range.
+        # Returns a DataFrame of the solved parameters, the insertion state, the residuals, whether each problem converged
+        # and the number of trajectories it took
+        free = [free] if isinstance(free, str) else list(free)
+        if candidates is None:
+            candidates = {name: np.array([np.median(self.grid[name])]) for name in self.param_names}
+        candidates = {name: np.atleast_1d(np.asarray(candidates[name], dtype=float)) for name in self.param_names}
+        n = max(value.size for value in candidates.values())
+        candidates = {name: np.broadcast_to(value, (n,)).copy() for name, value in candidates.items()}
+        if bounds is None:
+            bounds = {}
+        low = np.array([bounds.get(name, (np.min(self.grid[name]), np.max(self.grid[name])))[0] for name in free])
+        high = np.array([bounds.get(name, (np.min(self.grid[name]), np.max(self.grid[name])))[1] for name in free])
+        trajectories = np.zeros(n, dtype=int)
+
+        def insert(x, problems, count=True):
+            # Insertion state of the problems with their free parameters at x (unit cube, one row per problem)
+            points = {name: value[problems] for name, value in candidates.items()}
+            for i, name in enumerate(free):
+                points[name] = low[i] + x[:, i] * (high[i] - low[i])
+            lanes = self.initLanes(points)
+            np.add.at(trajectories, problems, int(count))
+            return self.insertionTable(self.integrate(lanes, dt, compact_every=20, method=method, end='insertion'))
+
+        def residual(table):
+            return np.stack([(table['h'].to_numpy() - h_target) / h_tol, (table['gamma'].to_numpy() - gamma_target) / gamma_tol], axis=1)[:, :len(free)]
+
+        problems = np.arange(n)
+        if len(free) == 1:
+            # scan for the first bracket of the altitude
+            grid = np.linspace(0, 1, scan)
+            f = residual(insert(np.repeat(grid, n)[:, None], np.tile(problems, scan)))[:, 0].reshape(scan, n)
+            change = np.sign(f[:-1]) != np.sign(f[1:])
+            bracketed = change.any(axis=0)
+            first = np.argmax(change, axis=0)
+            a, b = grid[first], grid[first + 1]
+            f_a, f_b = f[first, problems], f[first + 1, problems]
+            closest = np.argmin(np.abs(f), axis=0)
+            x = np.where(bracketed, a, grid[closest])
+            f_x = np.where(bracketed, f_a, f[closest, problems])
+            side = np.zeros(n, dtype=int)  # end of the bracket kept by the last iteration (-1 a, 1 b)
+            for iteration in range(max_iterations):
+                live = bracketed & (np.abs(f_x) > 1) & (b - a > 1e-9)
+                if not live.any():
+                    break
+                x_new = np.where(live, b - f_b * (b - a) / np.where(f_b != f_a, f_b - f_a, 1), x)
+                x_new = np.where(live & ((x_new <= a) | (x_new >= b)), (a + b) / 2, x_new)
+                f_new = f_x.copy()
+                f_new[live] = residual(insert(x_new[live, None], problems[live]))[:, 0]
+                keep_a = live & (np.sign(f_new) == np.sign(f_b))  # the root is between a and x_new
+                keep_b = live & ~keep_a
+                # Illinois: halve the residual of an end kept twice in a row so it is not kept forever
+                f_a = np.where(keep_a & (side == -1), f_a / 2, f_a)
+                f_b = np.where(keep_b & (side == 1), f_b / 2, f_b)
+                b, f_b = np.where(keep_a, x_new, b), np.where(keep_a, f_new, f_b)
+                a, f_a = np.where(keep_b, x_new, a), np.where(keep_b, f_new, f_a)
+                side = np.where(keep_a, -1, np.where(keep_b, 1, side))
+                x, f_x = np.where(live, x_new, x), np.where(live, f_new, f_x)
+            x = x[:, None]
+        else:
+            # Newton iterations from the starting values, the Jacobian by forward differences in the same batch as the point
+            delta = 0.01
+            x = np.stack([(candidates[name] - low[i]) / (high[i] - low[i]) for i, name in enumerate(free)], axis=1).clip(0, 1)
+            f_x = np.zeros((n, 2))
+            J = np.zeros((n, 2, 2))  # d residual / d x
+            live = np.ones(n, dtype=bool)
+            for iteration in range(max_iterations + 1):
+                # the differences step away from the nearest bound
+                h = np.where(x[live] + delta <= 1, delta, -delta)
+                points = [x[live], x[live] + h * [1, 0], x[live] + h * [0, 1]]
+                r = residual(insert(np.concatenate(points), np.tile(problems[live], 3))).reshape(3, -1, 2)
+                f_x[live] = r[0]
+                J[live] = np.stack([(r[1] - r[0]) / h[:, :1], (r[2] - r[0]) / h[:, 1:]], axis=2)
+                live &= np.abs(f_x).max(axis=1) > 1
+                if not live.any() or iteration == max_iterations:
+                    break
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    step = -np.linalg.solve(J[live] + 1e-9 * np.eye(2), f_x[live][:, :, None])[:, :, 0]
+                step = np.nan_to_num(step) * np.minimum(1, 0.25 / np.maximum(np.abs(step).max(axis=1), 1e-12))[:, None]
+                x[live] = np.clip(x[live] + step, 0, 1)
+        solution = {name: value.copy() for name, value in candidates.items()}
+        for i, name in enumerate(free):
+            solution[name] = low[i] + x[:, i] * (high[i] - low[i])
+        table = insert(x, problems, count=False)  # every x has been evaluated
+        result = pd.DataFrame({name: solution[name] for name in self.param_names})
+        for name in self.insertion_names:
+            result['insertion_' + name] = table[name].to_numpy()
+        result['h_residual'] = table['h'].to_numpy() - h_target
+        result['gamma_residual'] = table['gamma'].to_numpy() - gamma_target
+        result['converged'] = (np.abs(result['h_residual']) <= h_tol) & ((len(free) == 1) | (np.abs(result['gamma_residual']) <= gamma_tol))
+        result['trajectories'] = trajectories
+        return result
+
+    def siteTrade(self, sites=None, inclinations=None, grid=None, dt=1, compact_every=20, method='euler', chunk_size=None, drag_loss=0.2):
+        # Sweeps the grid from every launch site (dict of name: latitude in deg, default launch_sites) into every inclination
+        # (deg, default the inclination of the mission) as one run: the grid is repeated for each site and inclination and
+        # every lane carries the velocity of its site, retrograde for inclinations above 90 deg. The delta-v budget of
+        # Mission.set_dV_reqs (dVBudget with the orbit of the Mission of loadMission and drag_loss in km/s) is computed for every
+        # case; the inclinations a site cannot launch into directly are not flown. The candidates are not pruned as dominated,
+        # since the sites do not compete. Sets self.site_record (the results of every lane with its site and inclination) and
+        # returns the site by inclination table of the optimal feasible candidate of each case, e.g.
+        # siteTrade()['delta_v_circularization'].unstack() for the matrix of the objective
+        sites = self.launch_sites if sites is None else sites
+        inclinations = [self.inc] if inclinations is None else list(inclinations)
+        cases = pd.MultiIndex.from_product([list(sites), inclinations], names=['site', 'inclination'])
+        latitude = np.array([sites[site] for site, inc in cases], dtype=float)
+        inc = np.array([inc for site, inc in cases], dtype=float)
+        mission = loadMission(self.mission)
+        budget = dVBudget(np.radians(latitude), np.radians(inc), mission.h_a, mission.h_p, mission.delta_plane, drag_loss=drag_loss) * 1000  # (m/s)
+        v_ls = self.v_equator * np.cos(np.radians(latitude)) * np.where(inc < 90, 1, -1)
+        flown = np.flatnonzero(np.isfinite(budget[1]))
+        grid_candidates = self.gridCandidates(grid)
+        n = len(grid_candidates['pitch_kick'])
+        candidates = {name: np.tile(value, flown.size) for name, value in grid_candidates.items()}
+        candidates['v_ls'] = np.repeat(v_ls[flown], n)
+        record, max_q, screen = self.runCandidates(candidates, dt, compact_every, method, ['altitude', 'circularization', 'inclination'],
+                                                   True, chunk_size)
+        case = flown[record.index // n]
+        record['delta_v_ideal'] = screen['delta_v_ideal'].to_numpy()[record.index]
+        record.insert(0, 'site', cases.get_level_values('site')[case])
+        record.insert(1, 'inclination', inc[case])
+        record.index = record.index % n
+        self.site_record = record
+        table = pd.DataFrame({'latitude': latitude, 'v_ls': v_ls, 'delta_v_needed': budget[0], 'delta_v_design': budget[1]}, index=cases)
+        results = record[record['check']]
+        table['feasible'] = results.groupby(['site', 'inclination']).size().reindex(cases, fill_value=0)
+        best = results.sort_values(self.objective).drop_duplicates(['site', 'inclination']).set_index(['site', 'inclination'])
+        for name in ['delta_v_circularization', 't', 'h', 'v', 'delta_v_ideal']:
+            table[name] = best[name].reindex(cases)
+        table['delta_v_margin'] = table['delta_v_ideal'] - table['delta_v_design']  # ideal delta-v of the optimal candidate beyond the budget (m/s)
+        return table
+
+    def programCandidates(self, programs=None, grid=None):
+        # Candidates of every pitch program family (a dict of a name of pitch_programs: dict of axes of program_names, default
+        # program_grid), one family after the other: the full factorial of the grid and of the axes of the family, with the
+        # code of the family in 'program'. The program parameters a family does not iterate take the pitch_window kick, no
+        # steering rate and level pitch angles
+        programs = self.program_grid if programs is None else programs
+        grid_candidates = self.gridCandidates(grid)
+        defaults = {'kick_h': self.pitch_window[0], 'kick_dh': self.pitch_window[1] - self.pitch_window[0], 'steer_rate': 0}
+        families = []
+        for program, axes in programs.items():
+            names = list(axes)
+            values = np.meshgrid(*[np.asarray(axes[name], dtype=float) for name in names], indexing='ij')
+            values = dict(zip(names, [value.ravel() for value in values]))
+            k = values[names[0]].size if names else 1
+            n = len(grid_candidates['pitch_kick'])
+            family = {name: np.tile(value, k) for name, value in grid_candidates.items()}
+            family['program'] = np.full(n * k, self.pitch_programs.index(program))
+            for name in self.program_names[1:]:
+                family[name] = np.repeat(values[name], n) if name in values else np.full(n * k, float(defaults.get(name, 0)))
+            families.append(family)
+        return {name: np.concatenate([family[name] for family in families]) for name in families[0]}
+
+    def programTrade(self, programs=None, grid=None, dt=1, compact_every=20, method='euler', chunk_size=None):
+        # Sweeps the grid with every pitch program family of programCandidates as one run: the program parameters are lane
+        # arrays like the grid axes, so the families and their parameters are integrated together. The lanes of a family are
+        # pruned as 'dominated' by the incumbent of that family only, so the optimum of every family is exact. Sets
+        # self.program_record (the results of every lane with its program parameters, indexed by candidate number) and returns
+        # the table of the optimal feasible candidate of each family, e.g. programTrade()['delta_v_circularization']
+        programs = self.program_grid if programs is None else programs
+        candidates = self.programCandidates(programs, grid)
+        self.num_candidates = len(candidates['pitch_kick'])
+        record, max_q, self.screen = self.runCandidates(candidates, dt, compact_every, method, True, True, chunk_size)
+        record.insert(0, 'program', np.array(self.pitch_programs)[candidates['program'][record.index]])
+        for name in self.program_names[1:]:
+            record[name] = candidates[name][record.index]
+        self.program_record = record
+        families = list(programs)
+        table = pd.DataFrame(index=pd.Index(families, name='program'))
+        table['candidates'] = [np.count_nonzero(candidates['program'] == self.pitch_programs.index(program)) for program in families]
+        results = record[record['check']]
+        table['feasible'] = results.groupby('program').size().reindex(families, fill_value=0)
+        best = results.sort_values(self.objective).drop_duplicates('program')
+        best = best.assign(candidate=best.index, **{'Max-q (Pa)': max_q.loc[best.index, 'Max-q (Pa)']}).set_index('program').reindex(families)
+        for name in ['candidate', 'delta_v_circularization', 't', 'h', 'v', 'Max-q (Pa)'] + self.param_names + self.program_names[1:]:
+            table[name] = best[name]
+        return table
+
+    def monteCarlo(self, optimal=None, samples=2000, dispersions=None, chunk_size=None, processes=None, dt=1, method='euler', seed=0):
+        # Flies the trajectory of a results row (default the optimal one) with samples random dispersions of its vehicle as
+        # one batch of lanes: the thrust, Isp and dry mass of each step and the drag coefficient are scaled by normal factors of
+        # relative 1-sigma dispersions['thrust'], ['Isp'], ['dry_mass'] and ['Cd'], and every lane flies through a steady
+        # horizontal wind of 1-sigma dispersions['wind'] (m/s); the payload (self.payload) in the last step is not dispersed.
+        # Missing keys use self.dispersions. The lanes are integrated in
+        # chunks of chunk_size (default self.chunk_size), spread over processes worker processes if given. Sets
+        # self.monte_carlo (the dispersions and outputs of every sample) and returns the mean, standard deviation and
+        # percentiles of the outputs: Max-Q, its time, the altitude, velocity and time at the end of the gravity turn, the
+        # propellant left in the last stage, the delta-v to circularize and the fraction of feasible samples
+        if optimal is None:
+            optimal = self.optimalResult()
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        dispersions = dict(self.dispersions, **(dispersions or {}))
+        rng = np.random.default_rng(seed)
+        candidates = {name: np.full(samples, float(optimal[name])) for name in self.param_names}
+        factors = {name: 1 + dispersions[name] * rng.standard_normal((3, samples)) for name in ['thrust', 'Isp', 'dry_mass']}
+        factors['Cd'] = np.maximum(1 + dispersions['Cd'] * rng.standard_normal(samples), 0)  # of the whole vehicle
+        wind = dispersions['wind'] * rng.standard_normal(samples)
+        steps = np.repeat(self.steps[:, :, None], samples, axis=2)
+        dry_mass = self.steps[:, 3].copy()
+        dry_mass[self.num_stages - 1] -= self.payload  # the payload is not dispersed
+        dry_mass = dry_mass[:, None] * (factors['dry_mass'] - 1)  # change of the dry mass of each step (kg)
+        steps[:, 2] += dry_mass
+        steps[:, 3] += dry_mass
+        steps[:, 4] *= factors['thrust']
+        steps[:, 5] *= factors['Isp']
+        lanes = self.initLanes(candidates, steps)
+        lanes['drag_factor'] = np.repeat(factors['Cd'][None], 3, axis=0)
+        lanes['wind'] = wind
+
+        chunks = [compactLanes(lanes, slice(start, start + chunk_size)) for start in range(0, samples, chunk_size)]
+        if processes:
+            worker = copy.copy(self)
+            for name in ['record', 'results', 'max_q', 'screen', 'reductions', 'monte_carlo']:
+                worker.__dict__.pop(name, None)
+            with ProcessPoolExecutor(processes) as pool:
+                states = list(pool.map(integrateLanes, [worker] * len(chunks), chunks, [dt] * len(chunks), [method] * len(chunks)))
+        else:
+            states = [integrateLanes(self, chunk, dt, method) for chunk in chunks]
+        state = {name: np.concatenate([chunk_state[name] for chunk_state in states], axis=-1) for name in states[0]}
+
+        result = pd.DataFrame({'thrust_' + str(i + 1): factors['thrust'][i] for i in range(self.num_stages)})
+        for i in range(self.num_stages):
+            result['Isp_' + str(i + 1)] = factors['Isp'][i]
+            result['dry_mass_' + str(i + 1)] = factors['dry_mass'][i]
+        result['Cd'] = factors['Cd']
+        result['wind'] = wind
+        outputs = self.ascentOutputs(lanes, state)
+        self.monte_carlo = pd.concat([result, outputs], axis=1)
+        outputs = outputs.drop(columns='check')
+        summary = pd.DataFrame({'mean': outputs.mean(), 'std': outputs.std()})
+        for percentile in self.percentiles:
+            summary[str(percentile) + '%'] = outputs.quantile(percentile / 100)
+        summary.loc['feasible', 'mean'] = self.monte_carlo['check'].mean()
+        return summary
+
+    def ascentOutputs(self, lanes, state):
+        # Returns the Max-Q, its time, the altitude, velocity and time at the end of the gravity turn, the propellant left in
+        # the last stage (kg, NaN if the lane did not reach it), the delta-v to circularize and the check of every lane
+        dv_circ, check = self.finalChecks(lanes, state)[1:]
+        top = lanes['num_stages'] - 1
+        idx = np.arange(top.size)
+        return pd.DataFrame({
+            'max_q': state['max_q_q'],
+            'max_q_t': state['max_q_t'],
+            'h': state['h'],
+            'v': state['v'],
+            't': state['t'],
+            'propellant_left': np.where(state['stage'] == top, state['m'] - lanes['mf'][top, idx], np.nan),
+            'delta_v_circularization': dv_circ,
+            'check': check,
+        })
+
+    def sensitivity(self, optimal=None, relative_step=0.01, central=True, dt=1, method='rk45'):
+        # Finite-difference Jacobian of the ascent outputs of a results row (default the optimal trajectory) with respect to
+        # every input of the step vectors: Cd, Radius, mi, mf, Thrust and Isp of each step. Each input is moved by
+        # relative_step of its value, up and down with central (2N + 1 lanes) or up only (N + 1 lanes), and all cases fly as
+        # one batch. The default rk45 integrator locates staging and Max-Q, so the outputs move smoothly with the inputs.
+        # Returns a DataFrame of d(output)/d(input) in output units per input unit (kg, m, N, s), one row per input, and sets
+        # self.sensitivity_outputs (the outputs of every case)
+        if optimal is None:
+            optimal = self.optimalResult()
+        labels = ['Cd', 'Radius', 'mi', 'mf', 'Thrust', 'Isp']
+        inputs = [(i, j) for i in range(self.num_stages) for j in range(6) if self.steps[i, j] != 0]
+        signs = [1, -1] if central else [1]
+        cases = [(None, 0)] + [(k, sign) for k in range(len(inputs)) for sign in signs]
+        n = len(cases)
+        steps = np.repeat(self.steps[:, :, None], n, axis=2)
+        drag_factor = np.ones((3, n))
+        delta = np.zeros(len(inputs))
+        for lane, (k, sign) in enumerate(cases[1:], start=1):
+            i, j = inputs[k]
+            delta[k] = relative_step * abs(self.steps[i, j])
+            value = self.steps[i, j] + sign * delta[k]
+            if j == 0:
+                drag_factor[i, lane] = value / self.steps[i, 0]  # the drag tables hold the nominal Cd and radius
+            elif j == 1:
+                drag_factor[i, lane] = (value / self.steps[i, 1])**2
+            else:
+                steps[i, j, lane] = value
+        candidates = {name: np.full(n, float(optimal[name])) for name in self.param_names}
+        lanes = self.initLanes(candidates, steps)
+        lanes['drag_factor'] = drag_factor
+        if self.drag_model == 'constant':
+            lanes['CdS'] = lanes['CdS'] * drag_factor
+            del lanes['drag_factor']
+        state = self.integrate(lanes, dt, compact_every=20, method=method)
+        outputs = self.ascentOutputs(lanes, state).drop(columns='check')
+        self.sensitivity_outputs = outputs
+        values = outputs.to_numpy()
+        jacobian = np.zeros((len(inputs), values.shape[1]))
+        for k in range(len(inputs)):
+            up = values[1 + len(signs) * k]
+            down = values[2 + 2 * k] if central else values[0]
+            jacobian[k] = (up - down) / (len(signs) * delta[k])
+        index = [labels[j] + ' ' + str(i + 1) for i, j in inputs]
+        return pd.DataFrame(jacobian, index=index, columns=outputs.columns)
+
+    def history(self, optimal=None, every=None, tolerance=None, dt=1, method='euler'):
+        # History of a results row (default the optimal trajectory): time (s), altitude h (m), downrange x (m), velocity v (m/s),
+        # flight path angle gamma (rad), dynamic pressure q (Pa), mass m (kg) and acceleration a (m/s^2) of every step, the
+        # plot arrays of 'plotTraj.m'. The row is flown again as one lane with a Reducers.History, and the returned history
+        # is decimated by decimateHistory(every, tolerance), keeping the Max-Q row; every=None and tolerance=None keep all steps.
+        # The coast is integrated step by step (no keplerCoast) so that it can be plotted
+        if optimal is None:
+            optimal = self.optimalResult()
+        lanes = self.initLanes({name: np.array([float(optimal[name])]) for name in self.param_names})
+        reducers = self.reducers
+        recorder = History()
+        self.reducers = [MaxQ(), recorder]
+        try:
+            state = self.integrate(lanes, dt, method=method, kepler=False)
+        finally:
+            self.reducers = reducers
+        history = recorder.lane(0)
+        final = dict(state, q=self.derivatives(lanes, state)[5])  # the recorder sees the state before each step, not the last one
+        history.loc[len(history)] = [float(final[name][0]) for name in recorder.names]
+        history['a'] = np.gradient(history['v'].to_numpy(), history['t'].to_numpy())
+        return decimateHistory(history, every, tolerance, keep=[int(history['q'].idxmax())])
+
+    def pruneReport(self):
+        # Number and fraction of the candidates of the last sweep or refine pruned for each reason, and the steps at which they were pruned
+        pruned = self.record[self.record['pruned'] != '']
+        report = pruned.groupby('pruned')['pruned_step'].agg(['count', 'min', 'median', 'max'])
+        report.columns = ['candidates', 'first step', 'median step', 'last step']
+        report['fraction'] = report['candidates'] / self.num_candidates
+        return report
+
+    def optimalResult(self):
+        # The optimal trajectory is the feasible candidate with the least self.objective
+        if len(self.results) == 0:
+            raise ValueError('No feasible trajectory was found for ' + self.name)
+        return self.results.loc[self.results[self.objective].idxmin()]
+
+    def maxQConditions(self):
+        # Max-Q conditions of the optimal trajectory
+        return self.max_q.loc[[self.optimalResult().name]]
+
+    def writeMaxQConditions(self):
+        # In still air (no wind_profile) the angle of attack, wind speed and q-alpha are 0 and are left out of the csv
+        max_q = self.maxQConditions()
+        if self.wind_profile is None:
+            max_q = max_q.drop(columns=['Angle of Attack (rad)', 'Wind Speed (m/s)', 'q-alpha (Pa rad)'])
+        max_q.to_csv('LVMasses/Max Q Conditions_' + self.name + '.csv', index=False)
+
+    def writeLoadsEnvelope(self):
+        # Writes the q-alpha loads envelope of the last sweep with a Reducers.LoadsEnvelope to 'LVMasses/Max Q Envelope_<name>.csv'
+        self.reductions['LoadsEnvelope'].to_csv('LVMasses/Max Q Envelope_' + self.name + '.csv', index_label='Condition')
+
+    def writeHistory(self, history):
+        # Writes a history of history() to 'LVTrajectory/<name>History.csv'
+        history.to_csv('LVTrajectory/' + self.name + 'History.csv', index=False)
+
+    def print(self):
+        optimal = self.optimalResult()
+        print('The optimal trajectory of ' + self.name + ' out of ' + str(self.num_candidates) + ' candidates (' + str(len(self.results)) + ' feasible) is:')
+        for name in self.results_names[:self.results_names.index('evaluations') + 1]:
+            print('    ' + name + ' = ' + str(optimal[name]))
+        report = self.screenReport()
+        if len(report) > 0:
+            print(str(report['candidates'].sum()) + ' candidates were screened out before the sweep:')
+            print(report.to_string())
+        report = self.pruneReport()
+        if len(report) > 0:
+            print(str(report['candidates'].sum()) + ' candidates were pruned during the sweep:')
+            print(report.to_string())
+        if self.precision_report is not None:
+            print('The ' + str(len(self.precision_report)) + ' best ' + self.precision + ' candidates flown again in float64 '
+                  + ('CHANGED RANKING' if self.ranking_changed else 'kept their ranking') + ':')
+            print(self.precision_report.to_string())
+        print()
@@ -0,0 +1,47 @@
+# TRAJECTORY PLOTS SUMMARY:
+# Python replacement of the plot of 'plotTraj.m': altitude, flight path angle and acceleration on the left axis and velocity
+# and dynamic pressure on the right axis against time, with a line at Max-Q, saved as '<name> <mission>.png'. The plots are
+# drawn from the decimated histories of Trajectory.history() with the headless Agg backend, so they need no display and
+# plotHistories() can draw the figures of several vehicles at once in worker processes.
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+def plotHistory(name, mission, history, path=None):
+    # Plots a history of Trajectory.history() of the vehicle name (e.g. 'Zephyr-1') flying mission to path, by default
+    # '<name> <mission>.png' like 'plotTraj.m' (e.g. 'Zephyr 1.png'). Returns the path
+    title = name.split('-')[0] + ' ' + str(mission)
+    if path is None:
+        path = title + '.png'
+    t = history['t']
+    fig, left = plt.subplots(figsize=(10, 6))
+    left.plot(t, history['h'] / 1000, label='altitude')
+    left.plot(t, np.degrees(history['gamma']), label='gamma')
+    left.plot(t, history['a'], '-.', label='acceleration')
+    left.set_xlabel('Time (s)')
+    left.set_ylabel('Altitude (km), Flight Path Angle (Deg), Acceleration (m/s^2)')
+    right = left.twinx()
+    right.plot(t, history['v'], color='C3', label='velocity')
+    right.plot(t, history['q'] / 10, color='C4', label='dynamic pressure')
+    right.set_ylabel('Velocity (m/s), dynamic pressure (Pa/10)')
+    left.axvline(t[history['q'].idxmax()], color='k', linewidth=0.8)
+    lines = left.get_lines()[:3] + right.get_lines()
+    left.legend(lines, [line.get_label() for line in lines], loc='upper left')
+    left.set_title(title + ' Trajectory')
+    left.grid(True)
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+    return path
+
+def plotHistories(histories, processes=None):
+    # Plots the histories of several vehicles, a list of (name, mission, history), in worker processes (processes=1 plots
+    # them in this process). On Windows and macOS the workers are spawned and import the calling script again, so a script
+    # without an if __name__ == '__main__': guard must use processes=1. Returns the paths of the figures
+    if processes == 1:
+        return [plotHistory(*args) for args in histories]
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(plotHistory, *args) for args in histories]
+        return [future.result() for future in futures]
@@ -0,0 +1,48 @@
+# WIND SUMMARY:
+# Altitude-dependent wind profile flown by the batched trajectory in 'Trajectory.py' (Trajectory.wind_profile). The steady wind
+# is a table of altitude, wind in the trajectory plane (positive along the downrange direction) and crosswind normal to it,
+# loaded from a csv or built by jetStream(), plus an optional 1-cosine discrete gust over an altitude band. at() samples the
+# profile at the altitude of every lane at once, so the angle of attack and q-alpha at Max-Q come out of the same integration.
+
+from math import radians, sin, cos
+import numpy as np
+import pandas as pd
+
+class WindProfile:
+    """Steady wind table plus a 1-cosine gust, sampled for every lane of a trajectory batch"""
+
+    def __init__(self, altitude, wind, crosswind=None, gust=0, gust_altitude=11000, gust_length=1500, gust_direction=90):
+        self.altitude = np.asarray(altitude, dtype=float)  # (m), increasing
+        self.wind = np.asarray(wind, dtype=float)  # wind in the trajectory plane, positive downrange (m/s)
+        self.crosswind = np.zeros(self.altitude.size) if crosswind is None else np.asarray(crosswind, dtype=float)  # (m/s)
+        self.gust = gust  # peak speed of the gust (m/s)
+        self.gust_altitude = gust_altitude  # altitude at which the gust starts (m)
+        self.gust_length = gust_length  # thickness of the gust (m)
+        self.gust_direction = gust_direction  # direction of the gust from downrange towards the crosswind (deg)
+
+    @classmethod
+    def load(cls, path, **gust):
+        # Profile from a csv with the columns 'Altitude (m)', 'Wind (m/s)' and optionally 'Crosswind (m/s)'
+        df = pd.read_csv(path)
+        crosswind = df['Crosswind (m/s)'] if 'Crosswind (m/s)' in df else None
+        return cls(df['Altitude (m)'], df['Wind (m/s)'], crosswind, **gust)
+
+    @classmethod
+    def jetStream(cls, peak=50, peak_altitude=12000, ground=5, direction=0, **gust):
+        # Design profile rising linearly from the ground wind to a jet stream peak (m/s) at peak_altitude (m), falling to a
+        # tenth of the peak at twice that altitude and to calm above 30 km; direction is from downrange towards the crosswind (deg)
+        altitude = [0, peak_altitude, 2 * peak_altitude, max(30000, 2 * peak_altitude + 1)]
+        speed = np.array([ground, peak, peak / 10, 0])
+        return cls(altitude, speed * cos(radians(direction)), speed * sin(radians(direction)), **gust)
+
+    def at(self, h):
+        # Wind in the trajectory plane and crosswind (m/s) at the altitudes h of the lanes, calm above the table
+        wind = np.interp(h, self.altitude, self.wind, right=0)
+        crosswind = np.interp(h, self.altitude, self.crosswind, right=0)
+        if self.gust:
+            phase = (h - self.gust_altitude) / self.gust_length
+            inside = (phase > 0) & (phase < 1)
+            gust = np.where(inside, self.gust / 2 * (1 - np.cos(2 * np.pi * np.where(inside, phase, 0))), 0)
+            wind = wind + gust * cos(radians(self.gust_direction))
+            crosswind = crosswind + gust * sin(radians(self.gust_direction))
+        return wind, crosswind
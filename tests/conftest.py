@@ -0,0 +1,12 @@
+# The modules are flat in the repository root and read their csv files relative to it, so the tests import and run from there
+
+import os
+import sys
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+@pytest.fixture(autouse=True)
+def repositoryRoot(monkeypatch):
+    monkeypatch.chdir(root)
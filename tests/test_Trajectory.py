@@ -0,0 +1,35 @@
+# Checks of the batched trajectory sweep of 'Trajectory.py' on the Zephyr-1 TrajReqs
+
+import numpy as np
+from Trajectory import Trajectory, loadTrajReqs
+
+def zephyr():
+    # Zephyr-1 flying mission 1 from KSC with its 30 kg payload
+    return Trajectory('Zephyr-1', *loadTrajReqs('Zephyr-1', 30), 1, Trajectory.launch_sites['KSC'], 30)
+
+def test_pruned_sweep_keeps_the_optimum_of_another_objective():
+    # the 'dominated' bound is on the delta-v to circularize, so a sweep minimizing the time must not prune with it
+    trajectory = zephyr()
+    trajectory.objective = 't'
+    trajectory.sweep()
+    pruned = trajectory.optimalResult()
+    trajectory.sweep(prune=False)
+    unpruned = trajectory.optimalResult()
+    assert pruned.name == unpruned.name
+    assert pruned['t'] == unpruned['t']
+
+def test_rk45_needs_fewer_evaluations_than_euler():
+    # with the default tolerances the adaptive integrator uses fewer derivative evaluations per trajectory than the Euler
+    # sweep at dt = 1 s, and is closer to a tightly converged rk45 run
+    trajectory = zephyr()
+    candidates = trajectory.gridCandidates()
+    pick = np.random.default_rng(0).choice(len(candidates['pitch_kick']), 500, replace=False)
+    candidates = {name: value[pick] for name, value in candidates.items()}
+    lanes = trajectory.initLanes(candidates)
+    euler = trajectory.evaluate(lanes, trajectory.integrate(lanes, 1, compact_every=20), candidates)
+    rk45 = trajectory.evaluate(lanes, trajectory.integrate(lanes, 1, compact_every=20, method='rk45'), candidates)
+    trajectory.rtol, trajectory.atol, trajectory.event_tol = 1e-10, Trajectory.atol * 1e-6, 1e-6
+    converged = trajectory.evaluate(lanes, trajectory.integrate(lanes, 1, compact_every=20, method='rk45'), candidates)
+    assert rk45['evaluations'].mean() < euler['evaluations'].mean()
+    error = lambda record: np.median(np.abs(record['delta_v_circularization'] - converged['delta_v_circularization']))
+    assert error(rk45) < error(euler)